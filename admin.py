@@ -0,0 +1,371 @@
+import csv
+import io
+from datetime import date
+from sqlalchemy.orm import joinedload, contains_eager
+from flask import (Blueprint, render_template, request, url_for, redirect, flash, abort, jsonify, Response,
+                   stream_with_context, g, current_app)
+from flask_login import login_required, current_user
+from models import db, User, Doctor, Department, Slot, Appointment
+from counters import get_counts
+from database import read_only
+from search import match_filter
+from scheduling import create_slots
+from cache import cache
+from pagination import id_page, appointment_page
+from lookups import department_list, directory_changed
+from profiling import profiler
+from exports import stream_export, export_filename, FORMATS, STATUSES
+from jobs import jobs
+from bulk import read_doctor_csv, create_doctors, set_blocked, delete_users
+from auth import forget_session_user
+from doctor import schedule_form
+
+# Admin pages: dashboard, doctors and departments, exports and the
+# cache/job/query diagnostics.
+
+admin = Blueprint('admin', __name__)
+
+#####################################################################################
+#                            !Admin Routes          
+#####################################################################################
+
+# ADMIN DASHBOARD
+@admin.route('/admin_dashboard')
+@login_required
+@read_only
+def admin_dashboard():
+    if current_user.role != 'admin':
+        abort(403)
+
+    counts = get_counts()
+    total_doctors = counts.get('doctors', 0)
+    total_patients = counts.get('patients', 0)
+    total_treatments = counts.get('treatments', 0)
+
+    # Doctor search
+    d_query = request.args.get('d')
+    doc_base = (Doctor.query
+                .join(User)
+                .join(Department)
+                .options(contains_eager(Doctor.user), contains_eager(Doctor.department)))
+    if d_query:
+        doc_base = doc_base.filter(match_filter(d_query, ('name', 'dept'), role='doctor'))
+    doctors, doctors_next = id_page(doc_base, Doctor.user_id, request.args.get('d_after'))
+
+    # Patient Search
+    p_query = request.args.get('p')
+    pat_base = User.query.filter_by(role='patient')
+    if p_query:
+        pat_base = pat_base.filter(match_filter(p_query, ('name', 'email', 'phone'), role='patient'))
+    patients, patients_next = id_page(pat_base, User.id, request.args.get('p_after'))
+
+    # Appointments (slot joined, patient/doctor/department loaded in the same query)
+    ap_base = (Appointment.query
+               .join(Slot)
+               .options(contains_eager(Appointment.slot),
+                        joinedload(Appointment.patient),
+                        joinedload(Appointment.doctor).joinedload(Doctor.user),
+                        joinedload(Appointment.doctor).joinedload(Doctor.department)))
+
+    up_appointments, up_next = appointment_page(
+        ap_base.filter(Slot.date >= date.today()), request.args.get('up_after'))
+    
+    past_appointments, past_next = appointment_page(
+        ap_base.filter(Slot.date < date.today()), request.args.get('past_after'))
+
+    return render_template('admin/admin_dash.html', 
+                           doctors=doctors, 
+                           patients=patients, 
+                           up_appointments=up_appointments,
+                           past_appointments=past_appointments,
+                           doctors_next=doctors_next,
+                           patients_next=patients_next,
+                           up_next=up_next,
+                           past_next=past_next,
+                           total_doctors=total_doctors,
+                           total_patients=total_patients,
+                           total_treatments=total_treatments,
+                           departments=department_list(),
+                           export_formats=FORMATS,
+                           statuses=STATUSES)
+
+
+# ADD NEW DOCTOR
+@admin.route('/add_doctor', methods=['GET', 'POST'])
+@login_required
+def add_doctor():
+    if current_user.role != 'admin':
+        abort(403)
+
+    departments = Department.query.all()
+
+    if request.method == 'POST':
+        name = request.form.get('name')
+        email = request.form.get('email')
+        phone = request.form.get('phone')
+        password = request.form.get('password')
+        dept_id = request.form.get('dept_id')
+        description = request.form.get('description')
+
+        # Validation
+        if User.query.filter_by(email=email).first():
+            flash("Email already registered!", "warning")
+            return redirect(url_for('admin.add_doctor'))
+
+        # New Doctor (Login Details)
+        new_user = User(
+            name=name, 
+            email=email, 
+            phone=phone, 
+            role='doctor'
+        )
+        new_user.set_password(password)
+
+        # New Doctor Entry (Profile Details), saved with the user in one commit
+        new_user.doctor_profile = Doctor(
+            dept_id=dept_id,
+            description=description
+        )
+        
+        db.session.add(new_user)
+        directory_changed.send(current_app._get_current_object())
+        db.session.commit()
+
+        flash(f"{name} added successfully!", "success")
+        return redirect(url_for('admin.admin_dashboard'))
+
+    return render_template('admin/add_doctor.html', departments=departments)
+
+
+# BLOCK/UNBLOCK Patient and Doctors
+@admin.route('/toggle_block/<int:user_id>')
+@login_required
+def toggle_block(user_id):
+    if current_user.role != 'admin':
+        abort(403)
+
+    user = User.query.get_or_404(user_id)
+    
+    user.is_blocked = not user.is_blocked
+    
+    db.session.commit()
+    forget_session_user(user_id)
+    
+    status = "Blocked" if user.is_blocked else "Unblocked"
+    flash(f"{user.name} has been {status}!", "success")
+    
+    return redirect(url_for('admin.admin_dashboard'))
+
+
+# ADD DEPARTMENT
+@admin.route('/add_department', methods=['GET', 'POST'])
+@login_required
+def add_department():
+    if current_user.role != 'admin':
+        abort(403)
+
+    if request.method == 'POST':
+        name = request.form.get('name')
+        description = request.form.get('description')
+
+        if Department.query.filter_by(name=name).first():
+            flash(f"Department '{name}' already exists!", "warning")
+            return redirect(url_for('admin.add_department'))
+
+        # New Department
+        new_dept = Department(name=name, description=description)
+        db.session.add(new_dept)
+        directory_changed.send(current_app._get_current_object())
+        db.session.commit()
+
+        flash(f"Department '{name}' added successfully!", "success")
+        return redirect(url_for('admin.admin_dashboard'))
+
+    return render_template('admin/add_department.html')
+
+
+# DEPARTMENT SCHEDULE: weekly pattern for every doctor in a department
+@admin.route('/department_schedule', methods=['GET', 'POST'])
+@login_required
+def department_schedule():
+    if current_user.role != 'admin':
+        abort(403)
+
+    departments = Department.query.all()
+
+    if request.method == 'POST':
+        dept = Department.query.get_or_404(request.form.get('dept_id', type=int))
+        pattern = schedule_form()
+        if not pattern:
+            return redirect(url_for('admin.department_schedule'))
+
+        doctor_ids = [d for (d,) in db.session.query(Doctor.user_id).filter_by(dept_id=dept.id)]
+        if not doctor_ids:
+            flash(f"No doctors in {dept.name} yet!", "warning")
+            return redirect(url_for('admin.department_schedule'))
+
+        created, skipped = create_slots(doctor_ids, *pattern)
+        flash(f"{dept.name}: {created} slots added for {len(doctor_ids)} doctors, "
+              f"{skipped} already existed.", "success")
+        return redirect(url_for('admin.admin_dashboard'))
+
+    return render_template('admin/department_schedule.html', departments=departments,
+                           today=date.today(), horizon=current_app.config['SCHEDULE_HORIZON_DAYS'])
+
+
+# Update Doctor's Profile
+@admin.route('/edit_doctor/<int:user_id>', methods=['GET', 'POST'])
+@login_required
+def edit_doctor(user_id):
+    if current_user.role != 'admin':
+        abort(403)
+
+    doctor = Doctor.query.get_or_404(user_id)
+    departments = Department.query.all()
+
+    if request.method == 'POST':
+        doctor.user.name = request.form.get('name')
+        doctor.dept_id = request.form.get('dept_id')
+        doctor.description = request.form.get('description')
+
+        directory_changed.send(current_app._get_current_object())
+        db.session.commit()
+        forget_session_user(user_id)
+        
+        flash(f"{doctor.user.name}'s profile updated successfully!", "success")
+        return redirect(url_for('admin.admin_dashboard'))
+
+    return render_template('admin/edit_doctor.html', doctor=doctor, departments=departments)
+
+
+# IMPORT DOCTORS (CSV upload; every row is created or none)
+@admin.route('/import_doctors', methods=['POST'])
+@login_required
+def import_doctors():
+    if current_user.role != 'admin':
+        abort(403)
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash("Choose a CSV file to import!", "warning")
+        return redirect(url_for('admin.add_doctor'))
+
+    try:
+        rows = read_doctor_csv(io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline=''))
+    except (ValueError, csv.Error) as e:
+        flash(f"Could not read the CSV: {e}", "danger")
+        return redirect(url_for('admin.add_doctor'))
+
+    created, errors = create_doctors(rows)
+    if errors:
+        shown = '; '.join(f"line {line}: {message}" for line, message in errors[:5])
+        flash(f"Nothing imported, {len(errors)} row(s) need fixing. {shown}", "danger")
+        return redirect(url_for('admin.add_doctor'))
+
+    flash(f"{created} doctors imported successfully!", "success")
+    return redirect(url_for('admin.admin_dashboard'))
+
+
+# BULK USER ACTIONS (block / unblock / delete the ticked users)
+@admin.route('/bulk_users', methods=['POST'])
+@login_required
+def bulk_users():
+    if current_user.role != 'admin':
+        abort(403)
+
+    action = request.form.get('action')
+    user_ids = request.form.getlist('user_ids', type=int)
+    if not user_ids:
+        flash("No users selected!", "warning")
+        return redirect(url_for('admin.admin_dashboard'))
+
+    if action in ('block', 'unblock'):
+        changed = set_blocked(user_ids, action == 'block')
+        flash(f"{len(changed)} user(s) {action}ed!", "success")
+    elif action == 'delete':
+        deleted = delete_users(user_ids)
+        flash(f"{len(deleted)} user(s) and all associated data have been deleted.", "success")
+    else:
+        abort(400)
+    return redirect(url_for('admin.admin_dashboard'))
+
+
+# DELETE USER
+@admin.route('/delete_user/<int:user_id>', methods=['POST'])
+@login_required
+def delete_user(user_id):
+    if current_user.role != 'admin':
+        abort(403)
+
+    user = User.query.get_or_404(user_id)
+    name = user.name
+
+    # one set-based DELETE per table, however much history the user has
+    if not delete_users([user_id]):
+        flash("Admin accounts cannot be deleted.", "danger")
+        return redirect(url_for('admin.admin_dashboard'))
+    
+    flash(f"User '{name}' and all associated data have been deleted.", "success")
+    return redirect(url_for('admin.admin_dashboard'))
+
+
+# EXPORT APPOINTMENTS (streamed CSV/NDJSON, optionally gzipped)
+@admin.route('/export/appointments')
+@login_required
+def export_appointments():
+    if current_user.role != 'admin':
+        abort(403)
+
+    fmt = request.args.get('format', 'csv')
+    status = request.args.get('status') or None
+    gzip = request.args.get('gzip') == '1'
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        flash("Invalid date range!", "warning")
+        return redirect(url_for('admin.admin_dashboard'))
+    if fmt not in FORMATS or (status and status not in STATUSES):
+        flash("Invalid export format or status!", "warning")
+        return redirect(url_for('admin.admin_dashboard'))
+
+    chunks = stream_export(fmt, gzip, start=start, end=end, status=status,
+                           doctor_id=request.args.get('doctor', type=int),
+                           dept_id=request.args.get('dept', type=int))
+
+    # rows are read while the response is sent, so route them to the replica here
+    def generate():
+        g.db_read_only = True
+        yield from chunks
+
+    mimetype = 'application/gzip' if gzip else ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{export_filename(fmt, gzip)}"'})
+
+
+# CACHE STATS (monitoring)
+@admin.route('/cache_stats')
+@login_required
+def cache_stats():
+    if current_user.role != 'admin':
+        abort(403)
+    return jsonify(cache.stats())
+
+
+# JOB QUEUE (counts by status, latest dead-lettered jobs)
+@admin.route('/job_stats')
+@login_required
+def job_stats():
+    if current_user.role != 'admin':
+        abort(403)
+    return jsonify(jobs.stats())
+
+
+# QUERY PROFILE (per-endpoint SQL counts/timings, recent requests, N+1 flags)
+@admin.route('/query_profile')
+@login_required
+def query_profile():
+    if current_user.role != 'admin':
+        abort(403)
+    return jsonify(profiler.report())
+
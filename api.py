@@ -0,0 +1,303 @@
+import hashlib
+import json
+from datetime import date, timedelta
+from flask import Blueprint, jsonify, request, abort, make_response
+from flask_login import current_user, login_user, logout_user
+from werkzeug.exceptions import HTTPException
+from sqlalchemy.orm import contains_eager
+from models import db, User, Slot, Appointment
+from booking import book_slot, availability_slots, slot_status, earliest_open_slots, EARLIEST_MAX_DAYS, WON, LOST
+from counters import get_counts, get_versions, version_key
+from lookups import department_list, department_info, doctor_info
+from notifications import appointment_event
+from pagination import appointment_page, PAGE_SIZE
+from treatments import treatments_page, treatment_changes, delta_token
+from timeline import visit_page, patient_summary
+
+# JSON API, version 1 (/api/v1). Same session login, models and rules as the
+# HTML views. Read endpoints send an ETag built from the data_versions rows
+# they depend on (one indexed read), so a client repeating a request with
+# If-None-Match gets 304 before any slot/appointment query runs.
+
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+# batch availability limits
+MAX_DOCTORS = 50
+MAX_DAYS = 31
+
+
+@api.errorhandler(HTTPException)
+def api_error(e):
+    return jsonify({'error': e.name, 'message': e.description}), e.code
+
+
+@api.before_request
+def require_login():
+    if request.endpoint != 'api_v1.session' and not current_user.is_authenticated:
+        abort(401, "Log in with POST /api/v1/session")
+
+
+def _role(*roles):
+    if current_user.role not in roles:
+        abort(403)
+
+
+# JSON response for `build()`, or 304 if the client's ETag is still current.
+# The ETag covers the URL, the user, today's date and the given version keys.
+def conditional(version_keys, build):
+    versions = get_versions(version_keys)
+    tag = hashlib.sha1(json.dumps([request.full_path, current_user.get_id(), date.today().isoformat(),
+                                   sorted(versions.items())]).encode()).hexdigest()
+    if request.if_none_match.contains(tag):
+        response = make_response('', 304)
+    else:
+        response = jsonify(build())
+    response.set_etag(tag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _date_arg(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, f"{name} must be YYYY-MM-DD")
+
+
+def appointment_json(ap):
+    return {'id': ap.id, 'status': ap.status, 'slot_id': ap.slot_id,
+            'date': ap.slot.date.isoformat(), 'time': ap.slot.time,
+            'doctor_id': ap.doctor_id, 'patient_id': ap.patient_id,
+            'booked_at': ap.created_at.isoformat()}
+
+
+def department_json(dept):
+    return {'id': dept.id, 'name': dept.name, 'description': dept.description,
+            'doctors': [{'user_id': d.user_id, 'user': {'name': d.name}} for d in dept.doctors]}
+
+
+def doctor_json(doctor):
+    dept = doctor.department
+    return {'user_id': doctor.user_id, 'description': doctor.description, 'user': {'name': doctor.name},
+            'department': {'id': dept.id, 'name': dept.name} if dept else None}
+
+
+def treatment_json(tr):
+    return {'id': tr.id, 'appointment_id': tr.appointment_id, 'created_at': tr.created_at.isoformat(),
+            'patient_id': tr.appointment.patient_id, 'patient': tr.appointment.patient.name,
+            'visit_type': tr.visit_type, 'diagnosis': tr.diagnosis}
+
+
+## Session
+
+@api.route('/session', methods=['POST', 'DELETE'])
+def session():
+    if request.method == 'DELETE':
+        logout_user()
+        return '', 204
+    data = request.get_json(silent=True) or {}
+    email = (data.get('email') or '').strip().lower()
+    user = User.query.filter_by(email=email).first()
+    if not (user and data.get('password') and user.check_password(data['password'])):
+        abort(401, "Invalid email or password")
+    if user.role != data.get('role', user.role):
+        abort(403, f"You are not registered with {data['role']} role")
+    if user.is_blocked:
+        abort(403, "Account is blocked")
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+        db.session.commit()
+    login_user(user)
+    return jsonify({'id': user.id, 'name': user.name, 'role': user.role})
+
+
+## Directory (in-memory snapshot, see lookups.py)
+
+@api.route('/departments')
+def departments():
+    return jsonify([{'id': d.id, 'name': d.name} for d in department_list()])
+
+
+@api.route('/departments/<int:dept_id>')
+def department(dept_id):
+    dept = department_info(dept_id)
+    if not dept:
+        abort(404)
+    return jsonify(department_json(dept))
+
+
+@api.route('/doctors/<int:doctor_id>')
+def doctor(doctor_id):
+    info = doctor_info(doctor_id)
+    if not info:
+        abort(404)
+    return jsonify(doctor_json(info))
+
+
+## Availability
+
+# GET /availability?doctors=1,2,3&start=YYYY-MM-DD&end=YYYY-MM-DD (default: next 7 days)
+# -> {"<doctor id>": {"<date>": {"<shift>": {"slot_id", "status"}}}} with the
+# statuses of check_availability (OPEN, NotAvailable, or the patient's own BOOKED/...)
+@api.route('/availability')
+def availability():
+    try:
+        doctor_ids = sorted({int(d) for d in request.args.get('doctors', '').split(',') if d})
+    except ValueError:
+        abort(400, "doctors must be a comma separated list of ids")
+    if not doctor_ids or len(doctor_ids) > MAX_DOCTORS:
+        abort(400, f"Give 1 to {MAX_DOCTORS} doctors")
+    start = _date_arg('start', date.today())
+    end = _date_arg('end', start + timedelta(days=6))
+    if end < start or (end - start).days >= MAX_DAYS:
+        abort(400, f"Date range must be 1 to {MAX_DAYS} days")
+
+    def build():
+        grid = {str(d): {} for d in doctor_ids}
+        for s in availability_slots(doctor_ids, start, end):
+            grid[str(s.doctor_id)].setdefault(s.date.isoformat(), {})[s.time] = {
+                'slot_id': s.id, 'status': slot_status(s, current_user.id)}
+        return grid
+
+    return conditional([version_key('doctor', d) for d in doctor_ids], build)
+
+
+# GET /availability/earliest?dept_id=...&days=7 -> the first open slots (one
+# page), ranked by date and shift, in one department or all of them
+@api.route('/availability/earliest')
+def earliest():
+    _role('patient')
+    dept_id = request.args.get('dept_id', type=int)
+    days = request.args.get('days', 7, type=int)
+    if not 1 <= days <= EARLIEST_MAX_DAYS:
+        abort(400, f"days must be 1 to {EARLIEST_MAX_DAYS}")
+
+    def build():
+        today = date.today()
+        rows = earliest_open_slots(current_user.id, today, today + timedelta(days=days - 1), dept_id, PAGE_SIZE)
+        return [{'slot_id': r.slot_id, 'date': r.date.isoformat(), 'time': r.time,
+                 'doctor_id': r.doctor_id, 'doctor': r.doctor,
+                 'dept_id': r.dept_id, 'department': r.department} for r in rows]
+
+    return conditional([version_key('appointments')], build)
+
+
+## Appointments
+
+# GET /appointments?when=upcoming|past&status=...&cursor=...
+# Patients get their own, doctors theirs, admins everyone's.
+@api.route('/appointments')
+def appointments():
+    when = request.args.get('when', 'upcoming')
+    status = request.args.get('status')
+    if when not in ('upcoming', 'past'):
+        abort(400, "when must be upcoming or past")
+
+    if current_user.role == 'patient':
+        scope, keys = Appointment.patient_id == current_user.id, [version_key('patient', current_user.id)]
+    elif current_user.role == 'doctor':
+        scope, keys = Appointment.doctor_id == current_user.id, [version_key('doctor', current_user.id)]
+    else:
+        scope, keys = None, [version_key('appointments')]
+
+    def build():
+        query = (Appointment.query
+                 .join(Slot)
+                 .options(contains_eager(Appointment.slot))
+                 .filter(Slot.date >= date.today() if when == 'upcoming' else Slot.date < date.today()))
+        if scope is not None:
+            query = query.filter(scope)
+        if status:
+            query = query.filter(Appointment.status == status)
+        rows, next_cursor = appointment_page(query, request.args.get('cursor'))
+        return {'appointments': [appointment_json(ap) for ap in rows], 'next_cursor': next_cursor}
+
+    return conditional(keys, build)
+
+
+# POST /appointments {"slot_id": ...} -> 201 booked, 409 taken or already booked in that shift
+@api.route('/appointments', methods=['POST'])
+def book():
+    _role('patient')
+    slot_id = (request.get_json(silent=True) or {}).get('slot_id')
+    slot = db.session.get(Slot, slot_id) if isinstance(slot_id, int) else None
+    if not slot:
+        abort(404, "Slot not found")
+    outcome, appointment = book_slot(current_user.id, slot)
+    if outcome == WON:
+        return jsonify(appointment_json(appointment)), 201
+    if outcome == LOST:
+        abort(409, "Someone just booked this slot")
+    abort(409, f"You already have a booking on {slot.date} in the {slot.time}")
+
+
+@api.route('/appointments/<int:id>/cancel', methods=['POST'])
+def cancel(id):
+    ap = db.session.get(Appointment, id) or abort(404)
+    if ap.patient_id != current_user.id and current_user.role not in ('admin', 'doctor'):
+        abort(403)
+    ap.status = 'cancelled'
+    ap.slot.sync_state(ap)
+    appointment_event(ap, 'cancelled')
+    db.session.commit()
+    return jsonify(appointment_json(ap))
+
+
+# GET /treatments?cursor=...  -> the doctor's completed treatments, newest first, plus `since`
+# GET /treatments?since=...   -> only what changed after that token: `changed` rows to
+#                                add or replace, `removed` ids, and the next `since`
+@api.route('/treatments')
+def treatments():
+    _role('doctor')
+    since = request.args.get('since')
+
+    def build():
+        if since:
+            changed, removed, token = treatment_changes(current_user.id, since)
+            return {'changed': [treatment_json(t) for t in changed], 'removed': removed, 'since': token}
+        token = delta_token()
+        rows, next_cursor = treatments_page(current_user.id, request.args.get('cursor'))
+        return {'treatments': [treatment_json(t) for t in rows], 'next_cursor': next_cursor, 'since': token}
+
+    return conditional([version_key('doctor', current_user.id)], build)
+
+
+# GET /patients/<id>/timeline?cursor=... -> history summary + one page of completed
+# visits, newest first (patients: their own; doctors: their visits with the patient)
+@api.route('/patients/<int:patient_id>/timeline')
+def timeline(patient_id):
+    if current_user.role == 'patient' and current_user.id != patient_id:
+        abort(403)
+    doctor_id = current_user.id if current_user.role == 'doctor' else None
+    db.session.get(User, patient_id) or abort(404)
+
+    def build():
+        summary = patient_summary(patient_id)
+        visits, next_cursor = visit_page(patient_id, request.args.get('cursor'), doctor_id)
+        return {
+            'summary': {**summary, 'last_visit': summary['last_visit'] and summary['last_visit'].isoformat(),
+                        'departments': dict(summary['departments']), 'recurring': dict(summary['recurring'])},
+            'visits': [{'appointment_id': v.id, 'date': v.date.isoformat(), 'time': v.time,
+                        'doctor_id': v.doctor_id, 'doctor': v.doctor, 'department': v.department,
+                        'visit_type': v.visit_type, 'tests_done': v.tests_done, 'diagnosis': v.diagnosis,
+                        'prescription': v.prescription, 'medicines': v.medicines} for v in visits],
+            'next_cursor': next_cursor,
+        }
+
+    return conditional([version_key('patient', patient_id)], build)
+
+
+## Admin
+
+@api.route('/stats')
+def stats():
+    _role('admin')
+    counts = get_counts()
+    return jsonify({'doctors': counts.get('doctors', 0),
+                    'patients': counts.get('patients', 0),
+                    'treatments': counts.get('treatments', 0),
+                    'appointments': {s: counts.get(f'appointments:{s}', 0)
+                                     for s in ('booked', 'completed', 'cancelled')}})
@@ -0,0 +1,80 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, insert, delete, literal, func, or_
+from models import (db, Slot, Appointment, Treatment,
+                    ArchivedSlot, ArchivedAppointment, ArchivedTreatment)
+from counters import apply_deltas, status_key, bump_versions
+
+# Archival of old visits. Slots dated more than ARCHIVE_AFTER_DAYS ago with no
+# booked appointment move, together with all their appointments and treatments, into
+# archived_* tables of the same shape (same ids), one batch per transaction
+# with set-based INSERT ... SELECT / DELETE. The live tables then only hold
+# the recent past and the future, which is all the dashboards and
+# check_availability read; history and patient_history read both halves
+# through timeline.py. Dashboard totals keep counting archived rows.
+
+BATCH_SIZE = 500
+
+# live model -> archive model, in the order rows must be copied
+_PAIRS = ((Slot, ArchivedSlot), (Appointment, ArchivedAppointment), (Treatment, ArchivedTreatment))
+
+
+def _copy(model, archive_model, where, now):
+    table = model.__table__
+    names = [c.name for c in table.columns]
+    rows = select(*table.columns, literal(now, db.DateTime)).where(where)
+    return insert(archive_model.__table__).from_select(names + ['archived_at'], rows)
+
+
+# Moves every slot dated before `cutoff` without a booked appointment
+# (and its appointments and treatments) to the archive; returns the number of
+# rows moved per table
+def archive_before(cutoff, batch_size=BATCH_SIZE):
+    moved = {'slots': 0, 'appointments': 0, 'treatments': 0}
+    while True:
+        slot_ids = [s for (s,) in (db.session.query(Slot.id)
+                                   .filter(Slot.date < cutoff,
+                                           ~Slot.appointments.any(Appointment.status == 'booked'))
+                                   .order_by(Slot.id)
+                                   .limit(batch_size))]
+        if not slot_ids:
+            break
+        appointment_ids = select(Appointment.id).where(Appointment.slot_id.in_(slot_ids)).scalar_subquery()
+        where = {
+            Slot: Slot.id.in_(slot_ids),
+            Appointment: Appointment.slot_id.in_(slot_ids),
+            Treatment: Treatment.appointment_id.in_(appointment_ids),
+        }
+        owners = (db.session.query(Slot.doctor_id, Appointment.patient_id)
+                  .outerjoin(Appointment, Appointment.slot_id == Slot.id)
+                  .filter(Slot.id.in_(slot_ids))
+                  .distinct().all())
+        bump_versions(db.session.connection(), [d for d, _ in owners], [p for _, p in owners if p])
+        now = datetime.now()
+        for model, archive_model in _PAIRS:
+            db.session.execute(_copy(model, archive_model, where[model], now))
+        # children first
+        for (model, _), key in zip(reversed(_PAIRS), ('treatments', 'appointments', 'slots')):
+            moved[key] += db.session.execute(delete(model).where(where[model])).rowcount
+        db.session.commit()
+    return moved
+
+
+def archive_old_visits(days):
+    return archive_before(date.today() - timedelta(days=days))
+
+
+# Deletes the archived visits of users being deleted (as patients or doctors),
+# in the caller's transaction, keeping the dashboard totals in step
+def purge_archived(user_ids):
+    appointments = select(ArchivedAppointment.id).where(or_(
+        ArchivedAppointment.patient_id.in_(user_ids),
+        ArchivedAppointment.doctor_id.in_(user_ids)))
+    deltas = {status_key(status): -n for status, n in
+              db.session.query(ArchivedAppointment.status, func.count())
+              .filter(ArchivedAppointment.id.in_(appointments))
+              .group_by(ArchivedAppointment.status)}
+    deltas['treatments'] = -db.session.execute(
+        delete(ArchivedTreatment).where(ArchivedTreatment.appointment_id.in_(appointments))).rowcount
+    db.session.execute(delete(ArchivedAppointment).where(ArchivedAppointment.id.in_(appointments)))
+    db.session.execute(delete(ArchivedSlot).where(ArchivedSlot.doctor_id.in_(user_ids)))
+    apply_deltas(db.session.connection(), deltas)
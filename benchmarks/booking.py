@@ -0,0 +1,91 @@
+# Concurrent booking stress test + throughput benchmark (SQLite file database).
+#
+#   python -m benchmarks.booking --slots 20 --bookers 300 --bookings 2000 --threads 64
+#
+# Contention: every one of `slots` slots gets `bookers` distinct patients racing
+# for it. Checks that each slot ends with exactly one winner and one booked
+# appointment and reports attempts/sec.
+# Throughput: `bookings` free slots, each booked by a different patient from
+# the same thread pool; reports successful bookings/sec.
+import argparse
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from sqlalchemy import func, insert
+from models import db, User, Department, Doctor, Slot, Appointment
+from booking import book_slot, WON
+from benchmarks.common import make_app, remove_db
+
+
+def seed(n_slots, n_patients):
+    dept = Department(name='General', description='General Physician')
+    user = User(name='Dr. Bench', email='doc@bench', role='doctor', password_hash='-')
+    db.session.add_all([dept, user])
+    db.session.flush()
+    db.session.add(Doctor(user_id=user.id, dept_id=dept.id, description='-'))
+    db.session.execute(insert(User), [
+        {'name': f'Patient {i}', 'email': f'p{i}@bench', 'role': 'patient', 'password_hash': '-'}
+        for i in range(n_patients)])
+    db.session.execute(insert(Slot), [
+        {'doctor_id': user.id, 'date': date.today() + timedelta(days=i // 2),
+         'time': ('morning', 'evening')[i % 2]}
+        for i in range(n_slots)])
+    db.session.commit()
+    patient_ids = [u for (u,) in db.session.query(User.id).filter_by(role='patient')]
+    slot_ids = [s for (s,) in db.session.query(Slot.id)]
+    return slot_ids, patient_ids
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--slots', type=int, default=20)
+    parser.add_argument('--bookers', type=int, default=300, help='patients racing per slot')
+    parser.add_argument('--bookings', type=int, default=2000, help='uncontended bookings')
+    parser.add_argument('--threads', type=int, default=64)
+    args = parser.parse_args()
+
+    app, db_path = make_app()
+    with app.app_context():
+        slot_ids, patient_ids = seed(args.slots + args.bookings, max(args.bookers, args.bookings))
+    slot_ids, free_ids = slot_ids[:args.slots], slot_ids[args.slots:]
+
+    def attempt(job):
+        slot_id, patient_id = job
+        with app.app_context():
+            return slot_id, book_slot(patient_id, db.session.get(Slot, slot_id))[0]
+
+    def run(jobs):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            results = list(pool.map(attempt, jobs))
+        return results, time.perf_counter() - start
+
+    # contention: patient i books every slot, so each slot sees `bookers` competitors
+    attempts = [(slot_id, patient_id) for patient_id in patient_ids[:args.bookers] for slot_id in slot_ids]
+    results, elapsed = run(attempts)
+
+    outcomes = Counter(outcome for _, outcome in results)
+    winners = Counter(slot_id for slot_id, outcome in results if outcome == WON)
+    with app.app_context():
+        booked = dict(db.session.query(Appointment.slot_id, func.count())
+                      .filter(Appointment.status == 'booked')
+                      .group_by(Appointment.slot_id))
+    ok = all(winners[s] == 1 and booked.get(s) == 1 for s in slot_ids)
+
+    print(f"contention: {len(attempts)} attempts on {len(slot_ids)} slots with {args.threads} threads: {dict(outcomes)}")
+    print(f"  one winner per slot: {'yes' if ok else 'NO'}")
+    print(f"  {len(attempts) / elapsed:,.0f} attempts/sec ({elapsed:.2f}s)")
+
+    # throughput: one patient per free slot
+    results, elapsed = run(list(zip(free_ids, patient_ids)))
+    won = sum(1 for _, outcome in results if outcome == WON)
+    print(f"throughput: {won}/{len(free_ids)} booked with {args.threads} threads")
+    print(f"  {won / elapsed:,.0f} bookings/sec ({elapsed:.2f}s)")
+    remove_db(db_path)
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+# Bulk admin operations: set-based bulk.py vs the one-user-at-a-time ORM path.
+#
+#   python -m benchmarks.bulk --doctors 1000 --appointments 1000 10000
+#
+# Onboarding: --doctors doctors created as add_doctor used to (User + Doctor
+# through the session, two commits each) and with create_doctors (one
+# transaction). Password hashing is the same work on both paths and is timed
+# on its own; the runs use --hash-method (cheap by default) so the database
+# side is visible. Deletion: for each --appointments size, one patient with
+# that many appointments (60% completed with a treatment) removed with
+# db.session.delete and with delete_users (what delete_user runs), reporting
+# time, statements and peak Python memory (tracemalloc, separate run). Each
+# run gets its own fresh database.
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from sqlalchemy import event, insert
+
+from benchmarks.common import remove_db
+
+
+def fresh_app(args):
+    from app import create_app
+    from schema import upgrade_schema
+    from models import db, User, Department
+
+    fd, path = tempfile.mkstemp(prefix='hms-bench-', suffix='.db')
+    os.close(fd)
+    os.remove(path)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}', 'PASSWORD_POOL_WORKERS': 0,
+                      'PASSWORD_HASH_METHOD': args.hash_method})
+    with app.app_context():
+        upgrade_schema()
+        db.session.add(Department(name='General', description='bench'))
+        db.session.add(User(name='Admin', email='admin@hms.com', role='admin', password_hash='x'))
+        db.session.commit()
+    return app, path
+
+
+def counted(app, fn):
+    from models import db
+
+    statements = [0]
+
+    def count(*a):
+        statements[0] += 1
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        event.remove(db.engine, 'before_cursor_execute', count)
+        db.session.remove()
+    return elapsed, statements[0]
+
+
+def peak_memory(app, fn):
+    from models import db
+
+    with app.app_context():
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        db.session.remove()
+    return peak
+
+
+def onboarding(args):
+    from flask import current_app
+    from models import db, User, Doctor
+    from passwords import hasher
+    from bulk import create_doctors
+    from lookups import directory_changed
+
+    rows = [(i + 2, {'name': f'Doctor {i}', 'email': f'doctor{i}@bench', 'phone': '', 'password': f'pw{i}',
+                     'department': 'General', 'description': 'bench'}) for i in range(args.doctors)]
+
+    def one_by_one():
+        for _, row in rows:
+            user = User(name=row['name'], email=row['email'], role='doctor')
+            user.set_password(row['password'])
+            db.session.add(user)
+            db.session.commit()
+            db.session.add(Doctor(user_id=user.id, dept_id=1, description=row['description']))
+            directory_changed.send(current_app._get_current_object())
+            db.session.commit()
+
+    def at_once():
+        created, errors = create_doctors([(line, dict(row)) for line, row in rows])
+        assert created == len(rows) and not errors, errors
+
+    app, path = fresh_app(args)
+    with app.app_context():
+        start = time.perf_counter()
+        hasher.hash_many([row['password'] for _, row in rows])
+        hashing = time.perf_counter() - start
+    print(f"onboarding {args.doctors} doctors ({args.hash_method}; hashing alone {hashing * 1000:.0f} ms)")
+    remove_db(path)
+    for name, fn in (('one by one', one_by_one), ('create_doctors', at_once)):
+        app, path = fresh_app(args)
+        elapsed, statements = counted(app, fn)
+        print(f"  {name:<16}{elapsed * 1000:>9.0f} ms{statements:>8} statements")
+        remove_db(path)
+
+
+def seed_history(app, appointments):
+    from models import db, User, Doctor, Slot, Appointment, Treatment
+    from counters import reconcile_counters
+
+    doctors = 50
+    with app.app_context():
+        ids = db.session.execute(insert(User).returning(User.id, sort_by_parameter_order=True),
+                                 [{'name': f'Doctor {i}', 'email': f'doctor{i}@bench', 'role': 'doctor',
+                                   'password_hash': 'x'} for i in range(doctors)]).scalars().all()
+        db.session.execute(insert(Doctor), [{'user_id': i, 'dept_id': 1, 'description': 'bench'} for i in ids])
+        patient_id = db.session.execute(insert(User).returning(User.id),
+                                        [{'name': 'Chronic', 'email': 'chronic@bench', 'role': 'patient',
+                                          'password_hash': 'x'}]).scalar()
+        first = date.today() - timedelta(days=appointments // (2 * doctors) // 2)
+        slots = [{'doctor_id': ids[n % doctors], 'date': first + timedelta(days=n // (2 * doctors)),
+                  'time': ('morning', 'evening')[n // doctors % 2], 'state': 'booked'} for n in range(appointments)]
+        slot_ids = db.session.execute(insert(Slot).returning(Slot.id, sort_by_parameter_order=True),
+                                      slots).scalars().all()
+        visits = [{'patient_id': patient_id, 'doctor_id': slot['doctor_id'], 'slot_id': slot_id,
+                   'status': 'completed' if n % 5 < 3 else 'booked'}
+                  for n, (slot, slot_id) in enumerate(zip(slots, slot_ids))]
+        visit_ids = db.session.execute(insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True),
+                                       visits).scalars().all()
+        db.session.execute(insert(Treatment), [{'appointment_id': visit_id, 'diagnosis': 'flu', 'medicines': 'rest'}
+                                               for visit, visit_id in zip(visits, visit_ids)
+                                               if visit['status'] == 'completed'])
+        db.session.commit()
+        reconcile_counters()
+    return patient_id
+
+
+def deletion(args):
+    from models import db, User, Slot, Appointment
+    from archive import purge_archived
+    from bulk import delete_users
+
+    def orm_delete(patient_id):
+        (Slot.query
+         .filter(Slot.appointment_id.in_(
+             db.session.query(Appointment.id).filter(Appointment.patient_id == patient_id)))
+         .update({'state': 'open', 'appointment_id': None}, synchronize_session=False))
+        purge_archived([patient_id])
+        db.session.delete(db.session.get(User, patient_id))
+        db.session.commit()
+
+    print(f"deleting a patient  {'appointments':>12}{'ms':>9}{'statements':>12}{'peak KiB':>10}")
+    for appointments in args.appointments:
+        for name, fn in (('session.delete', orm_delete), ('delete_users', lambda i: delete_users([i]))):
+            app, path = fresh_app(args)
+            patient_id = seed_history(app, appointments)
+            elapsed, statements = counted(app, lambda: fn(patient_id))
+            remove_db(path)
+            app, path = fresh_app(args)
+            patient_id = seed_history(app, appointments)
+            peak = peak_memory(app, lambda: fn(patient_id))
+            remove_db(path)
+            print(f"  {name:<18}{appointments:>12}{elapsed * 1000:>9.0f}{statements:>12}{peak / 1024:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--doctors', type=int, default=1000, help='doctors to onboard')
+    parser.add_argument('--appointments', type=int, nargs='+', default=[1000, 10000],
+                        help="appointments of the deleted patient (one run per size)")
+    parser.add_argument('--hash-method', default='pbkdf2:sha256:1000',
+                        help='PASSWORD_HASH_METHOD for the run (production: scrypt:32768:8:1)')
+    args = parser.parse_args()
+    onboarding(args)
+    deletion(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+import os
+import tempfile
+from flask import Flask
+from models import db
+from database import init_database
+from schema import upgrade_schema
+import counters  # noqa: F401  (registers the counter hooks, as in the real app)
+
+
+# Flask app bound to a throwaway SQLite file (the benchmarks never touch data.db).
+# sqlite_pragmas=None uses the production pragmas, {} connects with SQLite defaults.
+def make_app(db_path=None, sqlite_pragmas=None):
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix='hms-bench-', suffix='.db')
+        os.close(fd)
+        os.remove(db_path)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    if sqlite_pragmas is not None:
+        app.config['SQLITE_PRAGMAS'] = sqlite_pragmas
+    init_database(app, db)
+    with app.app_context():
+        upgrade_schema()
+    return app, db_path
+
+
+def remove_db(db_path):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
@@ -0,0 +1,100 @@
+# Department/doctor directory: in-memory snapshot vs loading ORM objects.
+#
+#   python -m benchmarks.seed --db /tmp/hms-bench.db
+#   python -m benchmarks.directory --db /tmp/hms-bench.db --runs 200
+#
+# Latency: what the department page needs (a department, its doctors and
+# their names) through the ORM the old way (Department, dept.doctors, then
+# doctor.user per doctor, fresh session each time) and from the snapshot.
+# Memory (tracemalloc): what the whole directory keeps alive as a snapshot vs
+# as ORM objects held by a session.
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from sqlalchemy import event
+
+from benchmarks.common import make_app
+from benchmarks.routes import percentile
+
+
+def measure(fn, runs, rng, dept_ids):
+    latencies = []
+    for _ in range(runs):
+        dept_id = rng.choice(dept_ids)
+        start = time.perf_counter()
+        fn(dept_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', required=True, help='SQLite file made by benchmarks.seed')
+    parser.add_argument('--runs', type=int, default=200, help='department lookups per path')
+    args = parser.parse_args()
+
+    app, _ = make_app(args.db)
+    app.config['DIRECTORY_CHECK_SECONDS'] = 3600
+    from models import db, Department
+    from lookups import Directory, directory, department_info, _directory_rows
+
+    statements = [0]
+    rng = random.Random(42)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.__setitem__(0, statements[0] + 1))
+        dept_ids = [d for (d,) in db.session.query(Department.id)]
+
+        def orm_page(dept_id):
+            dept = db.session.get(Department, dept_id)
+            names = [doctor.user.name for doctor in dept.doctors]
+            db.session.remove()
+            return len(names)
+
+        def snapshot_page(dept_id):
+            return len([doctor.name for doctor in department_info(dept_id).doctors])
+
+        directory.drop()
+        start = time.perf_counter()
+        snapshot = directory.get()
+        build_ms = (time.perf_counter() - start) * 1000
+        print(f"{len(snapshot.departments)} departments, {len(snapshot.doctors)} doctors; "
+              f"snapshot built in {build_ms:.1f} ms")
+
+        print(f"{'path':<10}{'p50 ms':>9}{'p95 ms':>9}{'queries/page':>14}")
+        for name, fn in (('orm', orm_page), ('snapshot', snapshot_page)):
+            statements[0] = 0
+            latencies = measure(fn, args.runs, rng, dept_ids)
+            print(f"{name:<10}{percentile(latencies, 50):>9.3f}{percentile(latencies, 95):>9.3f}"
+                  f"{statements[0] / args.runs:>14.1f}")
+
+        # memory kept for the full directory (fetched rows freed, strings kept)
+        db.session.remove()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        kept = Directory(0, _directory_rows())
+        db.session.remove()
+        gc.collect()
+        snap_bytes = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(before, 'filename'))
+        tracemalloc.stop()
+        del kept
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        depts = Department.query.all()
+        names = [doctor.user.name for dept in depts for doctor in dept.doctors]
+        gc.collect()
+        orm_bytes = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(before, 'filename'))
+        tracemalloc.stop()
+        del depts, names
+        db.session.remove()
+
+        print(f"{'memory':<10}{'KiB':>9}")
+        print(f"{'orm':<10}{orm_bytes / 1024:>9.1f}")
+        print(f"{'snapshot':<10}{snap_bytes / 1024:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
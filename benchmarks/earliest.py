@@ -0,0 +1,64 @@
+# Earliest-open-slot search latency (the "Find earliest slot" page).
+#
+#   python -m benchmarks.seed --db /tmp/hms-bench.db
+#   python -m benchmarks.earliest --db /tmp/hms-bench.db --days 31
+#
+# Publishes slots for every doctor up to --days ahead (idempotent), then times
+# earliest_open_slots() for a random patient across all departments and for
+# each department, over 7 days and --days. Exits non-zero if a p95 is above
+# --budget ms.
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import make_app
+from benchmarks.routes import percentile
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', required=True, help='SQLite file made by benchmarks.seed')
+    parser.add_argument('--days', type=int, default=31, help='publish and search this far ahead')
+    parser.add_argument('--runs', type=int, default=50, help='searches per case')
+    parser.add_argument('--budget', type=float, default=50.0, help='allowed p95 (ms)')
+    args = parser.parse_args()
+
+    app, _ = make_app(args.db)
+    from models import db, User, Doctor, Department, Slot
+    from scheduling import create_slots, SHIFTS
+    from booking import earliest_open_slots
+
+    rng = random.Random(42)
+    failed = False
+    with app.app_context():
+        today = date.today()
+        doctor_ids = [d for (d,) in db.session.query(Doctor.user_id)]
+        created, _ = create_slots(doctor_ids, today, today + timedelta(days=args.days - 1), range(7), SHIFTS)
+        open_slots = (db.session.query(Slot.id)
+                      .filter(Slot.state == 'open', Slot.date >= today,
+                              Slot.date < today + timedelta(days=args.days))
+                      .count())
+        patients = [u for (u,) in db.session.query(User.id).filter_by(role='patient').limit(2000)]
+        depts = [d for (d,) in db.session.query(Department.id)]
+        print(f"{len(doctor_ids)} doctors, {open_slots} open slots in the next {args.days} days "
+              f"({created} published now)")
+        print(f"{'scope':<12}{'days':>6}{'rows':>6}{'p50 ms':>9}{'p95 ms':>9}")
+
+        for dept_id in [None] + depts:
+            for days in (7, args.days):
+                latencies = []
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    rows = earliest_open_slots(rng.choice(patients), today, today + timedelta(days=days - 1), dept_id)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                p95 = percentile(latencies, 95)
+                failed |= p95 > args.budget
+                print(f"{('all' if dept_id is None else f'dept {dept_id}'):<12}{days:>6}{len(rows):>6}"
+                      f"{percentile(latencies, 50):>9.2f}{p95:>9.2f}" + ('  over budget' if p95 > args.budget else ''))
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
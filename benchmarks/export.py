@@ -0,0 +1,96 @@
+# Export memory check: peak Python memory must not grow with the number of rows.
+#
+#   python -m benchmarks.seed --db /tmp/hms-bench.db
+#   python -m benchmarks.export --db /tmp/hms-bench.db
+#
+# Streams the appointment export over growing date windows in each format,
+# discarding the output, and reports rows, bytes, rows/s and tracemalloc's
+# peak. The smallest window is the shortest one (from 1/16 of the days,
+# doubling) holding MIN_BATCHES full fetch batches, so its peak already
+# includes a whole batch; then 4x that and all of the data. Exits non-zero if
+# the peak of the largest export is more than --tolerance times the smallest
+# one's; a database too small for two windows is reported, not checked.
+import argparse
+import time
+import tracemalloc
+from datetime import timedelta
+from sqlalchemy import func, select
+
+from benchmarks.common import make_app
+
+MIN_BATCHES = 2
+
+
+def measure(stream_export, fmt, gzip, start, end):
+    rows = size = 0
+    tracemalloc.start()
+    began = time.perf_counter()
+    for chunk in stream_export(fmt, gzip, start=start, end=end):
+        size += len(chunk)
+        if not gzip:
+            rows += chunk.count(b'\n')
+    elapsed = time.perf_counter() - began
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if not gzip and fmt == 'csv':
+        rows -= 1  # header
+    return rows, size, elapsed, peak
+
+
+# rows the export would write for visits between start and end (inclusive)
+def count_rows(start, end):
+    from models import db
+    from exports import SOURCES, export_query
+
+    return sum(db.session.scalar(select(func.count()).select_from(
+        export_query(start=start, end=end, source=source).order_by(None).subquery())) for source in SOURCES)
+
+
+# day counts of the measured windows (see the header)
+def windows(first, days):
+    from exports import BATCH_SIZE
+
+    smallest = max(days // 16, 1)
+    while smallest < days and count_rows(first, first + timedelta(days=smallest - 1)) < MIN_BATCHES * BATCH_SIZE:
+        smallest *= 2
+    return sorted({min(smallest, days), min(smallest * 4, days), days})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', required=True, help='SQLite file made by benchmarks.seed')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='allowed peak growth (x)')
+    args = parser.parse_args()
+
+    app, _ = make_app(args.db)
+    from models import db, Slot
+    from exports import stream_export
+
+    failed = False
+    with app.app_context():
+        first, last = db.session.query(func.min(Slot.date), func.max(Slot.date)).one()
+        days = (last - first).days + 1
+        spans = windows(first, days)
+        if len(spans) == 1:
+            print(f"too few rows for a window of {MIN_BATCHES} export batches and a larger one: "
+                  f"peak growth not checked")
+        print(f"{'format':<12}{'days':>8}{'rows':>10}{'MB':>8}{'rows/s':>10}{'peak KiB':>10}")
+        for fmt, gzip in (('csv', False), ('ndjson', False), ('csv', True)):
+            peaks = []
+            for span in spans:
+                end = first + timedelta(days=span - 1)
+                rows, size, elapsed, peak = measure(stream_export, fmt, gzip, first, end)
+                db.session.remove()
+                peaks.append(peak)
+                label = fmt + ('.gz' if gzip else '')
+                print(f"{label:<12}{span:>8}{rows if not gzip else '-':>10}{size / 1e6:>8.1f}"
+                      f"{(rows / elapsed if rows else 0):>10.0f}{peak / 1024:>10.0f}")
+            if len(peaks) > 1 and peaks[-1] > peaks[0] * args.tolerance:
+                print(f"  peak grew {peaks[-1] / peaks[0]:.1f}x with the row count")
+                failed = True
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# Login throughput under dashboard load: password hashing inline vs in the pool.
+#
+#   python -m benchmarks.seed --db /tmp/hms-bench.db
+#   python -m benchmarks.login --db /tmp/hms-bench.db --workers 0 2 --seconds 10
+#
+# For each --workers value (0 = hash on the request thread), `logins` threads
+# POST /login as random patients while `readers` threads load the patient
+# dashboard and department pages. Reports logins/s, reads/s, p50/p95 of both
+# and how many logins were shed with 503 by the queue limit.
+import argparse
+import logging
+import os
+import random
+import threading
+import time
+
+from benchmarks.routes import percentile, sample_ids
+
+
+def run(app, hasher, ids, emails, workers, args):
+    app.config['PASSWORD_POOL_WORKERS'] = workers
+    app.config['PASSWORD_QUEUE_LIMIT'] = args.queue_limit or max(workers, 1) * 8
+    hasher.init_app(app)
+    hasher.verify(hasher.hash('warm-up'), 'warm-up')  # start the pool outside the timing
+
+    results = {'login': [], 'read': []}
+    shed = [0]
+    lock = threading.Lock()
+    stop = time.perf_counter() + args.seconds
+
+    def login_loop(n):
+        rng = random.Random(n)
+        client = app.test_client()
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            response = client.post('/login', data={'email': rng.choice(emails), 'pass': 'password',
+                                                   'role': 'patient'})
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if response.status_code == 503:
+                    shed[0] += 1
+                else:
+                    results['login'].append(elapsed)
+            client.get('/logout')
+
+    def read_loop(n):
+        rng = random.Random(1000 + n)
+        client = app.test_client()
+        while time.perf_counter() < stop:
+            with client.session_transaction() as sess:
+                sess['_user_id'] = str(rng.choice(ids['patient']))
+                sess['_fresh'] = True
+            url = rng.choice(['/patient_dashboard', f"/department_details/{rng.choice(ids['departments'])}"])
+            start = time.perf_counter()
+            client.get(url)
+            with lock:
+                results['read'].append((time.perf_counter() - start) * 1000)
+
+    threads = ([threading.Thread(target=login_loop, args=(i,)) for i in range(args.logins)] +
+               [threading.Thread(target=read_loop, args=(i,)) for i in range(args.readers)])
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    hasher.shutdown()
+
+    row = [f"{workers:>7}"]
+    for kind in ('login', 'read'):
+        values = results[kind] or [0]
+        row.append(f"{len(results[kind]) / args.seconds:>9.1f}{percentile(values, 50):>9.1f}{percentile(values, 95):>9.1f}")
+    print(''.join(row) + f"{shed[0]:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', required=True, help='SQLite file made by benchmarks.seed')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2], help='hashing processes (0 = inline)')
+    parser.add_argument('--logins', type=int, default=8, help='threads logging in')
+    parser.add_argument('--readers', type=int, default=4, help='threads loading dashboards')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--queue-limit', type=int, help='default: workers * 8')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(args.db)}"
+    from app import app
+    from models import db, User, Doctor, Department
+    from passwords import hasher
+    logging.getLogger('hms.profile').setLevel(logging.ERROR)
+
+    with app.app_context():
+        ids = sample_ids(db, (User, Doctor, Department))
+        emails = [e for (e,) in db.session.query(User.email).filter(User.id.in_(ids['patient'][:500]))]
+
+    print(f"{'workers':>7}{'login/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'read/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'shed':>7}")
+    for workers in args.workers:
+        run(app, hasher, ids, emails, workers, args)
+
+
+if __name__ == '__main__':
+    main()
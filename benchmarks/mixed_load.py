@@ -0,0 +1,100 @@
+# Mixed read/write load test: SQLite defaults vs the tuned pragmas in database.py.
+#
+#   python -m benchmarks.mixed_load --readers 6 --writers 2 --seconds 5
+#
+# Reader processes run the admin dashboard's upcoming-appointments page query in
+# a loop while writer processes book free slots, all on one database file
+# (processes, not threads, so the GIL doesn't hide lock contention). Each
+# configuration gets a fresh database file.
+import argparse
+import multiprocessing
+import time
+from datetime import date
+from sqlalchemy.orm import joinedload, contains_eager
+from models import db, Slot, Appointment, Doctor
+from booking import book_slot, WON
+from benchmarks.common import make_app, remove_db
+from benchmarks.booking import seed
+
+
+def reader(db_path, pragmas, seconds, results):
+    app, _ = make_app(db_path, pragmas)
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        with app.app_context():
+            (Appointment.query
+             .join(Slot)
+             .options(contains_eager(Appointment.slot),
+                      joinedload(Appointment.patient),
+                      joinedload(Appointment.doctor).joinedload(Doctor.user))
+             .filter(Slot.date >= date.today())
+             .order_by(Slot.date.asc(), Slot.time.desc(), Appointment.id.asc())
+             .limit(20)
+             .all())
+        count += 1
+    results.put(('read', count, 0))
+
+
+def writer(db_path, pragmas, seconds, jobs, results):
+    app, _ = make_app(db_path, pragmas)
+    count = errors = 0
+    deadline = time.perf_counter() + seconds
+    for slot_id, patient_id in jobs:
+        if time.perf_counter() >= deadline:
+            break
+        with app.app_context():
+            try:
+                if book_slot(patient_id, db.session.get(Slot, slot_id))[0] == WON:
+                    count += 1
+            except Exception:
+                errors += 1
+    results.put(('write', count, errors))
+
+
+def run(label, pragmas, args):
+    app, db_path = make_app(sqlite_pragmas=pragmas)
+    with app.app_context():
+        slot_ids, patient_ids = seed(args.slots, args.slots)
+        # half the slots pre-booked so the readers have rows to page through
+        for slot_id, patient_id in zip(slot_ids[::2], patient_ids):
+            book_slot(patient_id, db.session.get(Slot, slot_id))
+        db.engine.dispose()
+    free = list(zip(slot_ids[1::2], patient_ids[len(slot_ids[::2]):]))
+
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    procs = [ctx.Process(target=reader, args=(db_path, pragmas, args.seconds, results))
+             for _ in range(args.readers)]
+    procs += [ctx.Process(target=writer, args=(db_path, pragmas, args.seconds, free[i::args.writers], results))
+              for i in range(args.writers)]
+    for p in procs:
+        p.start()
+    totals = {'read': 0, 'write': 0, 'errors': 0}
+    for _ in procs:
+        kind, count, errors = results.get()
+        totals[kind] += count
+        totals['errors'] += errors
+    for p in procs:
+        p.join()
+
+    print(f"{label:>9}: {totals['read'] / args.seconds:8,.0f} reads/sec  "
+          f"{totals['write'] / args.seconds:6,.0f} writes/sec  ({totals['errors']} failed writes)")
+    remove_db(db_path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readers', type=int, default=6)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--slots', type=int, default=4000)
+    args = parser.parse_args()
+
+    print(f"{args.readers} reader / {args.writers} writer processes, {args.seconds:g}s each")
+    run('defaults', {}, args)
+    run('tuned', None, args)
+
+
+if __name__ == '__main__':
+    main()
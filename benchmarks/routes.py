@@ -0,0 +1,158 @@
+# Route benchmark: drives the real Flask views through the test client.
+#
+#   python -m benchmarks.seed --db /tmp/hms-bench.db
+#   python -m benchmarks.routes --db /tmp/hms-bench.db --concurrency 8 --requests 200 --save baseline.json
+#   python -m benchmarks.routes --db /tmp/hms-bench.db --compare baseline.json
+#
+# Each endpoint gets `requests` requests from `concurrency` threads, each as a
+# random user of the right role. Reports p50/p95/p99 latency and queries per
+# request; --save writes the results as JSON, --compare prints the change
+# against a saved run and exits non-zero if a p95 regressed past --threshold.
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# (name, role, url builder(ids, rng))
+ENDPOINTS = [
+    ('patient_dashboard', 'patient', lambda ids, rng, uid: '/patient_dashboard'),
+    ('department_details', 'patient', lambda ids, rng, uid: f"/department_details/{rng.choice(ids['departments'])}"),
+    ('doctor_details', 'patient', lambda ids, rng, uid: f"/doctor_details/{rng.choice(ids['doctor'])}"),
+    ('patient_search', 'patient', lambda ids, rng, uid: f"/patient_search?q={rng.choice(['cardio', 'priya', 'sharma', 'neuro'])}"),
+    ('check_availability', 'patient', lambda ids, rng, uid: f"/check_availability/{rng.choice(ids['doctor'])}"),
+    ('history', 'patient', lambda ids, rng, uid: f"/history/{uid}"),
+    ('doctor_dashboard', 'doctor', lambda ids, rng, uid: '/doctor_dashboard'),
+    ('patient_history', 'doctor', lambda ids, rng, uid: f"/patient_history/{rng.choice(ids['patient'])}"),
+    ('admin_dashboard', 'admin', lambda ids, rng, uid: '/admin_dashboard'),
+    ('admin_search', 'admin', lambda ids, rng, uid: f"/admin_dashboard?p={rng.choice(['priya', 'patient12', '98'])}"),
+    ('api_availability', 'patient', lambda ids, rng, uid: "/api/v1/availability?doctors="
+                                                           + ','.join(map(str, rng.sample(ids['doctor'], 10)))),
+    ('api_appointments', 'doctor', lambda ids, rng, uid: '/api/v1/appointments'),
+    ('api_treatments', 'doctor', lambda ids, rng, uid: '/api/v1/treatments'),
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def sample_ids(db, models, limit=2000):
+    User, Doctor, Department = models
+    return {
+        'admin': [u for (u,) in db.session.query(User.id).filter_by(role='admin').limit(limit)],
+        'doctor': [u for (u,) in db.session.query(Doctor.user_id).limit(limit)],
+        'patient': [u for (u,) in db.session.query(User.id).filter_by(role='patient').limit(limit)],
+        'departments': [d for (d,) in db.session.query(Department.id)],
+    }
+
+
+def run_endpoint(app, profiler, ids, name, role, build, args):
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(i):
+        rng = random.Random(i)
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        uid = rng.choice(ids[role])
+        with local.client.session_transaction() as sess:
+            sess['_user_id'] = str(uid)
+            sess['_fresh'] = True
+        url = build(ids, rng, uid)
+        start = time.perf_counter()
+        response = local.client.get(url)
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    profiler.by_endpoint.clear()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - start
+
+    profile = profiler.report()['endpoints']
+    queries = sum(p['avg_queries'] * p['requests'] for p in profile.values())
+    requests = sum(p['requests'] for p in profile.values())
+    return {
+        'requests': len(latencies),
+        'statuses': statuses,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'queries_per_request': round(queries / requests, 1) if requests else None,
+        'rps': round(len(latencies) / wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', required=True, help='SQLite file made by benchmarks.seed')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--only', nargs='*', help='endpoint names to run')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=20.0, help='allowed p95 regression (%%)')
+    args = parser.parse_args()
+
+    # the real app, pointed at the benchmark database
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.abspath(args.db)}"
+    from app import app
+    from models import db, User, Doctor, Department
+    from profiling import profiler
+    logging.getLogger('hms.profile').setLevel(logging.ERROR)
+
+    with app.app_context():
+        ids = sample_ids(db, (User, Doctor, Department))
+
+    results = {}
+    print(f"{'endpoint':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/req':>8}{'req/s':>8}")
+    for name, role, build in ENDPOINTS:
+        if args.only and name not in args.only:
+            continue
+        r = run_endpoint(app, profiler, ids, name, role, build, args)
+        results[name] = r
+        bad = {s: n for s, n in r['statuses'].items() if s >= 400}
+        print(f"{name:<20}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+              f"{r['queries_per_request'] or 0:>8.1f}{r['rps']:>8.1f}" + (f"  errors {bad}" if bad else ''))
+
+    run = {'when': time.strftime('%Y-%m-%d %H:%M:%S'), 'db': args.db,
+           'concurrency': args.concurrency, 'requests': args.requests, 'results': results}
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressed = False
+        print(f"\n{'vs ' + args.compare:<20}{'p95 ms':>16}{'change':>9}{'q/req':>14}")
+        for name, r in results.items():
+            if name not in baseline:
+                continue
+            b = baseline[name]
+            change = (r['p95_ms'] - b['p95_ms']) / b['p95_ms'] * 100 if b['p95_ms'] else 0
+            flag = ' REGRESSED' if change > args.threshold else ''
+            regressed |= bool(flag)
+            print(f"{name:<20}{b['p95_ms']:>7.1f} -> {r['p95_ms']:>6.1f}{change:>+8.0f}%"
+                  f"{b['queries_per_request'] or 0:>7.1f} -> {r['queries_per_request'] or 0:<5.1f}{flag}")
+        if regressed:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Search benchmark: ILIKE '%term%' scans vs the FTS5 index, on synthetic users.
+#
+#   python -m benchmarks.search --users 1000000
+#
+# Times the admin patient search (name/email/phone) and the patient-facing
+# doctor search (name/department) both ways for a handful of terms.
+import argparse
+import random
+import time
+from sqlalchemy import insert, or_
+from models import db, User, Doctor, Department
+from search import match_filter, search_user_ids, rebuild_search_index
+from benchmarks.common import make_app, remove_db
+
+FIRST = ['Aarav', 'Priya', 'Rohan', 'Ananya', 'Vikram', 'Meera', 'Kabir', 'Isha', 'Arjun', 'Diya',
+         'John', 'Maria', 'Chen', 'Fatima', 'Lucas', 'Olga', 'Kenji', 'Amara', 'Noah', 'Sofia']
+LAST = ['Sharma', 'Patel', 'Iyer', 'Reddy', 'Khan', 'Gupta', 'Nair', 'Singh', 'Das', 'Mehta',
+        'Smith', 'Garcia', 'Wang', 'Ali', 'Silva', 'Ivanova', 'Sato', 'Okafor', 'Brown', 'Rossi']
+DEPTS = ['General', 'Cardiology', 'Dermatology', 'Neurology', 'Orthopedics', 'Pediatrics']
+
+
+def seed(n_users, n_doctors, batch=50000):
+    rng = random.Random(42)
+    db.session.execute(insert(Department), [{'name': d, 'description': d} for d in DEPTS])
+    for start in range(0, n_users, batch):
+        db.session.execute(insert(User), [
+            {'name': f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+             'email': f"user{i}@mail{i % 97}.com",
+             'phone': f"9{rng.randrange(10**9):09d}",
+             'role': 'doctor' if i < n_doctors else 'patient',
+             'password_hash': '-'}
+            for i in range(start, min(start + batch, n_users))])
+    db.session.execute(insert(Doctor), [
+        {'user_id': i + 1, 'dept_id': rng.randrange(len(DEPTS)) + 1, 'description': '-'}
+        for i in range(n_doctors)])
+    db.session.commit()
+    rebuild_search_index(db.session.connection())
+    db.session.commit()
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--doctors', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app, db_path = make_app()
+    with app.app_context():
+        start = time.perf_counter()
+        seed(args.users, args.doctors)
+        print(f"seeded {args.users:,} users + FTS index in {time.perf_counter() - start:.1f}s\n")
+
+        print(f"{'query':<34}{'ILIKE ms':>10}{'FTS ms':>10}{'rows':>8}")
+        for term in ['priya', 'sharma', 'user12345', '98765', 'zzz']:
+            like = f"%{term}%"
+            old = lambda: (User.query.filter_by(role='patient')
+                           .filter(or_(User.name.ilike(like), User.email.ilike(like), User.phone.ilike(like)))
+                           .order_by(User.id).limit(20).all())
+            new = lambda: (User.query.filter_by(role='patient')
+                           .filter(match_filter(term, ('name', 'email', 'phone'), role='patient'))
+                           .order_by(User.id).limit(20).all())
+            old_ms, _ = timed(old, args.repeat)
+            new_ms, rows = timed(new, args.repeat)
+            print(f"{'admin patients ' + repr(term):<34}{old_ms:>10.1f}{new_ms:>10.1f}{len(rows):>8}")
+
+        for term in ['cardio', 'meera', 'sato neuro']:
+            like = f"%{term}%"
+            old = lambda: (Doctor.query.join(User).join(Department)
+                           .filter(or_(User.name.ilike(like), Department.name.ilike(like))).all())
+            new = lambda: search_user_ids(term, ('name', 'dept'), role='doctor')
+            old_ms, _ = timed(old, args.repeat)
+            new_ms, rows = timed(new, args.repeat)
+            print(f"{'doctor search ' + repr(term):<34}{old_ms:>10.1f}{new_ms:>10.1f}{len(rows):>8}")
+    remove_db(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# Synthetic hospital data generator (bulk inserts straight through the DB-API).
+#
+#   python -m benchmarks.seed --db /tmp/hms-bench.db --doctors 500 --patients 1000000 --appointments 10000000
+#
+# Layout: user 1 is the admin (admin@hms.com / admin123), then doctors, then
+# patients; every user's password is 'password'. Slots run back in time from
+# the last day of the booking window, two shifts per doctor per day, with one
+# appointment per slot until `appointments` is reached; the newest days also get
+# unbooked slots. Past appointments are completed (with a treatment) or
+# cancelled, upcoming ones booked or cancelled. Counters and the search index
+# are rebuilt at the end, so the file is ready for the app and the benchmarks.
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+from werkzeug.security import generate_password_hash
+from models import db
+from counters import reconcile_counters
+from search import rebuild_search_index
+from benchmarks.common import make_app
+from benchmarks.search import FIRST, LAST, DEPTS
+
+BATCH = 100000
+
+DIAGNOSES = ['Viral fever', 'Hypertension', 'Type 2 diabetes', 'Migraine', 'Eczema',
+             'Asthma', 'Back pain', 'Anxiety', 'Gastritis', 'Arrhythmia']
+MEDICINES = ['Paracetamol', 'Amlodipine', 'Metformin', 'Sumatriptan', 'Hydrocortisone',
+             'Salbutamol', 'Ibuprofen', 'Sertraline', 'Omeprazole', 'Metoprolol']
+
+
+def _batched(cursor, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            cursor.executemany(sql, batch)
+            batch.clear()
+    if batch:
+        cursor.executemany(sql, batch)
+
+
+def seed(conn, n_doctors, n_patients, n_appointments, n_departments, open_days, rng):
+    cursor = conn.cursor()
+    now = datetime.now().isoformat(' ')
+    password = generate_password_hash('password')
+    admin_password = generate_password_hash('admin123')
+    depts = (DEPTS * (n_departments // len(DEPTS) + 1))[:n_departments]
+
+    cursor.executemany(
+        "INSERT INTO departments (id, name, description) VALUES (?, ?, ?)",
+        [(i + 1, name if i < len(DEPTS) else f"{name} {i // len(DEPTS) + 1}", f"{name} specialists")
+         for i, name in enumerate(depts)])
+
+    doctor_ids = list(range(2, n_doctors + 2))
+    patient_ids = range(n_doctors + 2, n_doctors + n_patients + 2)
+
+    def users():
+        yield (1, 'Mr. Admin', 'admin@hms.com', None, 'admin', admin_password, 0, now)
+        for i in doctor_ids:
+            yield (i, f"Dr. {rng.choice(FIRST)} {rng.choice(LAST)}", f"doctor{i}@hms.com",
+                   f"9{rng.randrange(10**9):09d}", 'doctor', password, 0, now)
+        for i in patient_ids:
+            yield (i, f"{rng.choice(FIRST)} {rng.choice(LAST)}", f"patient{i}@mail.com",
+                   f"8{rng.randrange(10**9):09d}", 'patient', password, 0, now)
+
+    _batched(cursor, "INSERT INTO users (id, name, email, phone, role, password_hash, is_blocked, created_at) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", users())
+    cursor.executemany("INSERT INTO doctors (user_id, dept_id, description) VALUES (?, ?, ?)",
+                       [(i, rng.randrange(n_departments) + 1, 'Consultant') for i in doctor_ids])
+
+    # slots + appointments + treatments, newest day first
+    today = date.today()
+    last_day = today + timedelta(days=6)
+    slots, appointments, treatments = [], [], []
+    slot_id = appointment_id = 0
+
+    def flush():
+        cursor.executemany("INSERT INTO slots (id, doctor_id, date, time, created_at, state, appointment_id) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?)", slots)
+        cursor.executemany("INSERT INTO appointments (id, patient_id, doctor_id, slot_id, status, created_at) "
+                           "VALUES (?, ?, ?, ?, ?, ?)", appointments)
+        cursor.executemany("INSERT INTO treatments (id, appointment_id, visit_type, tests_done, diagnosis, "
+                           "prescription, medicines, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", treatments)
+        slots.clear(); appointments.clear(); treatments.clear()
+
+    day = last_day
+    while appointment_id < n_appointments:
+        day_str = day.isoformat()
+        for doctor_id in doctor_ids:
+            for shift in ('morning', 'evening'):
+                slot_id += 1
+                booked = appointment_id < n_appointments and (last_day - day).days >= open_days
+                if not booked:
+                    slots.append((slot_id, doctor_id, day_str, shift, now, 'open', None))
+                    continue
+                appointment_id += 1
+                if day >= today:
+                    status = 'cancelled' if rng.random() < 0.1 else 'booked'
+                else:
+                    status = 'cancelled' if rng.random() < 0.15 else 'completed'
+                state = {'booked': 'booked', 'completed': 'completed', 'cancelled': 'open'}[status]
+                slots.append((slot_id, doctor_id, day_str, shift, now, state, appointment_id))
+                appointments.append((appointment_id, rng.choice(patient_ids), doctor_id, slot_id, status, now))
+                if status == 'completed':
+                    visit = f"{day_str} {'10:00:00' if shift == 'morning' else '18:00:00'}"
+                    treatments.append((appointment_id, appointment_id, rng.choice(['In-person', 'Follow-up']),
+                                       'Blood test', rng.choice(DIAGNOSES), 'Rest and fluids',
+                                       rng.choice(MEDICINES), visit))
+        if len(slots) >= BATCH:
+            flush()
+        day -= timedelta(days=1)
+    flush()
+    conn.commit()
+    return slot_id, appointment_id
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', required=True, help='SQLite file to create')
+    parser.add_argument('--doctors', type=int, default=500)
+    parser.add_argument('--patients', type=int, default=100000)
+    parser.add_argument('--appointments', type=int, default=1000000)
+    parser.add_argument('--departments', type=int, default=12)
+    parser.add_argument('--open-days', type=int, default=3, help='newest days left unbooked')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app, db_path = make_app(args.db)
+    start = time.perf_counter()
+    with app.app_context():
+        raw = db.engine.raw_connection()
+        try:
+            raw.execute("PRAGMA synchronous=OFF")
+            n_slots, n_appointments = seed(raw, args.doctors, args.patients, args.appointments,
+                                           args.departments, args.open_days, random.Random(args.seed))
+        finally:
+            raw.close()
+        print(f"inserted {args.doctors + args.patients + 1:,} users, {n_slots:,} slots, "
+              f"{n_appointments:,} appointments in {time.perf_counter() - start:.1f}s")
+
+        with db.engine.begin() as conn:
+            rebuild_search_index(conn)
+        reconcile_counters()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+    print(f"ready: {db_path} ({time.perf_counter() - start:.1f}s total)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# Production server throughput: req/s as worker processes and threads grow.
+#
+#   python -m benchmarks.seed --db /tmp/hms-bench.db
+#   python -m benchmarks.server --db /tmp/hms-bench.db --workers 1 2 4 --threads 1 4 8 --seconds 10
+#
+# For every (workers, threads) pair, starts `flask --app app serve` on a free
+# port, waits for /readyz, then for each route keeps --clients keep-alive HTTP
+# connections busy for --seconds, each request as a random patient (signed
+# session cookie). Reports req/s, p50/p95 latency and non-200 responses. The
+# load generator runs on the same machine, so leave it some CPU.
+import argparse
+import http.client
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.routes import percentile, sample_ids
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, url builder(ids, rng))
+ROUTES = [
+    ('patient_dashboard', lambda ids, rng: '/patient_dashboard'),
+    ('check_availability', lambda ids, rng: f"/check_availability/{rng.choice(ids['doctor'])}"),
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(env, port, workers, threads):
+    proc = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'serve', '--bind', f'127.0.0.1:{port}',
+                             '--workers', str(workers), '--threads', str(threads)],
+                            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/readyz')
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise SystemExit(f"server with {workers} workers x {threads} threads did not get ready")
+
+
+def load(port, cookies, ids, build, args):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop = time.perf_counter() + args.seconds
+
+    def client(n):
+        rng = random.Random(n)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        while time.perf_counter() < stop:
+            headers = {'Cookie': f"session={rng.choice(cookies)}"}
+            start = time.perf_counter()
+            try:
+                conn.request('GET', build(ids, rng), headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                errors[0] += not ok
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(latencies) / args.seconds, latencies or [0], errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', required=True, help='SQLite file made by benchmarks.seed')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--clients', type=int, default=16, help='concurrent HTTP connections')
+    parser.add_argument('--seconds', type=float, default=10, help='load time per route')
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.abspath(args.db)}")
+    os.environ['DATABASE_URL'] = env['DATABASE_URL']
+    from app import create_app
+    from models import db, User, Doctor, Department
+
+    app = create_app()
+    with app.app_context():
+        ids = sample_ids(db, (User, Doctor, Department))
+    signer = app.session_interface.get_signing_serializer(app)
+    cookies = [signer.dumps({'_user_id': str(uid), '_fresh': True}) for uid in ids['patient'][:200]]
+
+    print(f"{'workers':>7}{'threads':>8}  {'route':<20}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+    for workers in args.workers:
+        for threads in args.threads:
+            port = free_port()
+            proc = start_server(env, port, workers, threads)
+            try:
+                for name, build in ROUTES:
+                    rps, latencies, errors = load(port, cookies, ids, build, args)
+                    print(f"{workers:>7}{threads:>8}  {name:<20}{rps:>8.1f}{percentile(latencies, 50):>9.1f}"
+                          f"{percentile(latencies, 95):>9.1f}{errors:>8}")
+            finally:
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == '__main__':
+    main()
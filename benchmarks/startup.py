@@ -0,0 +1,67 @@
+# Cold-start benchmark: how long a fresh worker process takes to serve.
+#
+#   python -m benchmarks.seed --db /tmp/hms-bench.db
+#   python -m benchmarks.startup --db /tmp/hms-bench.db --runs 10
+#
+# Each run is a new Python process that imports app, calls create_app() and
+# serves its first request (GET /login unless --url), once with every route
+# group and once per --subset (comma separated BLUEPRINTS, e.g. auth,api).
+# Reports the p50 of each phase and of the whole process, interpreter
+# start included.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.routes import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+response = application.test_client().get(%r)
+served = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'create_ms': (created - imported) * 1000,
+                  'first_request_ms': (served - created) * 1000, 'status': response.status_code}))
+"""
+
+PHASES = ('import_ms', 'create_ms', 'first_request_ms', 'process_ms')
+
+
+def run_once(db_path, url, blueprints):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.abspath(db_path)}")
+    if blueprints:
+        env['HMS_BLUEPRINTS'] = json.dumps(blueprints)
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', CHILD % url], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--db', required=True, help='SQLite file made by benchmarks.seed')
+    parser.add_argument('--runs', type=int, default=10, help='processes per case')
+    parser.add_argument('--url', default='/login', help='first request')
+    parser.add_argument('--subset', action='append', default=[], help='BLUEPRINTS to compare, e.g. auth,api')
+    args = parser.parse_args()
+
+    cases = [('all', None)] + [(s, s.split(',')) for s in args.subset]
+    print(f"{'blueprints':<24}" + ''.join(f"{p[:-3]:>16}" for p in PHASES) + f"{'status':>8}")
+    for name, blueprints in cases:
+        runs = [run_once(args.db, args.url, blueprints) for _ in range(args.runs)]
+        print(f"{name:<24}" + ''.join(f"{percentile([r[p] for r in runs], 50):>16.1f}" for p in PHASES)
+              + f"{runs[-1]['status']:>8}")
+
+
+if __name__ == '__main__':
+    main()
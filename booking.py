@@ -0,0 +1,118 @@
+from datetime import datetime
+from sqlalchemy import update, select, exists
+from sqlalchemy.orm import contains_eager, aliased
+from models import db, User, Doctor, Department, Slot, Appointment
+from notifications import appointment_event
+
+# booking outcomes
+WON = 'won'              # slot claimed, appointment booked
+LOST = 'lost'            # someone else holds the slot
+DUPLICATE = 'duplicate'  # patient already has a booking in this date/shift
+
+# how far ahead the earliest-open-slot search may look
+EARLIEST_MAX_DAYS = 31
+
+
+# Books `slot` for a patient and commits. The slot is claimed with a single
+# conditional UPDATE (state open -> booked) as the first statement of the
+# transaction, so of any number of concurrent bookers exactly one sees
+# rowcount 1; the rest get LOST without inserting anything.
+# Returns (outcome, appointment or None).
+def book_slot(patient_id, slot):
+    claim = (update(Slot)
+             .where(Slot.id == slot.id, Slot.state == 'open')
+             .values(state='booked')
+             .execution_options(synchronize_session=False))
+    if db.session.execute(claim).rowcount != 1:
+        db.session.rollback()
+        current = slot.current_appointment
+        if current and current.patient_id == patient_id and current.status == 'booked':
+            return DUPLICATE, current
+        return LOST, None
+
+    # checked while holding the claim, so two tabs of the same patient can't both pass
+    existing = (Appointment.query
+                .join(Slot, Appointment.slot_id == Slot.id)
+                .filter(Appointment.patient_id == patient_id,
+                        Appointment.status == 'booked',
+                        Slot.date == slot.date,
+                        Slot.time == slot.time)
+                .first())
+    if existing:
+        db.session.rollback()
+        return DUPLICATE, existing
+
+    # a patient re-booking a slot they cancelled reuses that row (uq_patient_slot)
+    appointment = Appointment.query.filter_by(patient_id=patient_id, slot_id=slot.id).first()
+    if appointment:
+        appointment.status = 'booked'
+        appointment.created_at = datetime.now()  # a new booking of the same row
+    else:
+        appointment = Appointment(patient_id=patient_id,
+                                  doctor_id=slot.doctor_id,
+                                  slot_id=slot.id,
+                                  status='booked')
+        db.session.add(appointment)
+    db.session.flush()
+
+    db.session.execute(update(Slot)
+                       .where(Slot.id == slot.id)
+                       .values(appointment_id=appointment.id)
+                       .execution_options(synchronize_session=False))
+    appointment_event(appointment, 'booked')
+    db.session.commit()
+    return WON, appointment
+
+
+# Slots of `doctor_ids` dated start..end (inclusive) with their current
+# appointment loaded, in one query
+def availability_slots(doctor_ids, start, end):
+    return (Slot.query
+            .outerjoin(Slot.current_appointment)
+            .options(contains_eager(Slot.current_appointment))
+            .filter(Slot.doctor_id.in_(doctor_ids),
+                    Slot.date >= start,
+                    Slot.date <= end)
+            .all())
+
+
+# What a patient sees for a slot in the availability grid
+def slot_status(slot, patient_id):
+    apt = slot.current_appointment
+    if apt and apt.patient_id == patient_id:
+        return apt.status.upper()  # BOOKED, COMPLETED, CANCELLED
+    if slot.state == 'open':
+        return 'OPEN'
+    return 'NotAvailable'
+
+
+_booked = aliased(Slot, name='booked_slot')
+
+
+# Earliest open slots dated start..end, across all doctors or one department,
+# ranked by date, shift (morning first) and doctor; skips shifts the patient
+# already has a booking in. One query that walks the partial ix_slots_open
+# index in ranking order and stops after `limit` rows. Returns rows of
+# (slot_id, date, time, doctor_id, doctor, dept_id, department).
+def earliest_open_slots(patient_id, start, end, dept_id=None, limit=20):
+    already_booked = (exists()
+                      .where(Appointment.patient_id == patient_id,
+                             Appointment.status == 'booked',
+                             _booked.id == Appointment.slot_id,
+                             _booked.date == Slot.date,
+                             _booked.time == Slot.time))
+    query = (select(Slot.id.label('slot_id'), Slot.date, Slot.time, Slot.doctor_id,
+                    User.name.label('doctor'), Department.id.label('dept_id'),
+                    Department.name.label('department'))
+             .join(Doctor, Doctor.user_id == Slot.doctor_id)
+             .join(User, User.id == Doctor.user_id)
+             .outerjoin(Department, Department.id == Doctor.dept_id)
+             .where(Slot.state == 'open',
+                    Slot.date >= start,
+                    Slot.date <= end,
+                    ~already_booked)
+             .order_by(Slot.date, Slot.time.desc(), Slot.doctor_id)
+             .limit(limit))
+    if dept_id is not None:
+        query = query.where(Doctor.dept_id == dept_id)
+    return db.session.execute(query).all()
@@ -0,0 +1,157 @@
+import csv
+from flask import current_app
+from sqlalchemy import select, insert, update, delete, func, or_, union
+from models import db, User, Doctor, Department, Slot, Appointment, Treatment, PatientSummary, ArchivedAppointment
+from counters import apply_deltas, status_key, dept_key, bump_versions, bump_versions_from
+from passwords import hasher
+from search import reindex_users
+from archive import purge_archived
+from lookups import directory_changed
+from auth import forget_session_user
+
+# Bulk admin operations (admin dashboard and `flask --app app import-doctors /
+# block-users / delete-users`). Each runs as one transaction of set-based
+# statements, however many users it touches, and keeps what the ORM hooks
+# would otherwise maintain in step: dashboard counters, data versions, the
+# search index, the doctor directory and cached session users. Admin
+# accounts are never blocked or deleted here.
+
+# CSV columns for create_doctors; department is a department name or id
+DOCTOR_COLUMNS = ('name', 'email', 'phone', 'password', 'department', 'description')
+REQUIRED_COLUMNS = ('name', 'email', 'password', 'department')
+
+
+# Doctor rows from a CSV text stream for create_doctors: [(line number, {column: value})]
+def read_doctor_csv(stream):
+    reader = csv.DictReader(stream)
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"CSV is missing the column(s): {', '.join(missing)}")
+    return [(reader.line_num, {c: (row.get(c) or '').strip() for c in DOCTOR_COLUMNS}) for row in reader]
+
+
+# Creates a doctor account + profile for every row, all or nothing.
+# Returns (doctors created, [(line, error)]); nothing is written if any row is invalid.
+def create_doctors(rows):
+    depts = {}
+    for dept_id, name in db.session.query(Department.id, Department.name):
+        depts[str(dept_id)] = depts[name.lower()] = dept_id
+
+    errors, seen = [], set()
+    for line, row in rows:
+        row['email'] = row['email'].lower()
+        empty = [c for c in REQUIRED_COLUMNS if not row[c]]
+        if empty:
+            errors.append((line, f"{', '.join(empty)} required"))
+        elif row['email'] in seen:
+            errors.append((line, f"{row['email']} appears twice"))
+        elif row['department'].lower() not in depts:
+            errors.append((line, f"unknown department {row['department']!r}"))
+        seen.add(row['email'])
+    taken = set(db.session.execute(select(User.email).where(User.email.in_(seen))).scalars()) if seen else set()
+    errors += [(line, f"{row['email']} already registered") for line, row in rows if row['email'] in taken]
+    if errors or not rows:
+        return 0, sorted(errors)
+
+    hashes = hasher.hash_many([row['password'] for _, row in rows])
+    # ids matched back by email: RETURNING in parameter order would insert row by row on SQLite
+    users = dict(db.session.execute(
+        insert(User).returning(User.email, User.id),
+        [{'name': row['name'], 'email': row['email'], 'phone': row['phone'] or None, 'role': 'doctor',
+          'password_hash': pwhash} for (_, row), pwhash in zip(rows, hashes)]).all())
+    doctors = [{'user_id': users[row['email']], 'dept_id': depts[row['department'].lower()],
+                'description': row['description']} for _, row in rows]
+    db.session.execute(insert(Doctor), doctors)
+
+    deltas = {'doctors': len(doctors)}
+    for doctor in doctors:
+        deltas[dept_key(doctor['dept_id'])] = deltas.get(dept_key(doctor['dept_id']), 0) + 1
+    conn = db.session.connection()
+    apply_deltas(conn, deltas)
+    reindex_users(conn, list(users.values()))
+    directory_changed.send(current_app._get_current_object())
+    db.session.commit()
+    return len(users), []
+
+
+def _target_ids(user_ids):
+    return select(User.id).where(User.id.in_(user_ids), User.role != 'admin')
+
+
+# Blocks (or unblocks) the given users in one statement; returns the ids changed
+def set_blocked(user_ids, blocked=True):
+    ids = db.session.execute(
+        update(User)
+        .where(User.id.in_(_target_ids(user_ids)), User.is_blocked != blocked)
+        .values(is_blocked=blocked)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)).scalars().all()
+    db.session.commit()
+    for user_id in ids:
+        forget_session_user(user_id)
+    return ids
+
+
+# Deletes the given users (patients and/or doctors) with everything that
+# hangs off them: their appointments as patient or doctor, the treatments of
+# those, a doctor's slots, summaries and archived visits. Slots held by a
+# deleted patient's appointments are opened again, and the history summaries
+# of the remaining patients who saw a deleted doctor are dropped (timeline.py
+# recomputes them). Returns the ids deleted.
+def delete_users(user_ids):
+    ids = db.session.execute(_target_ids(user_ids)).scalars().all()
+    if not ids:
+        return []
+    conn = db.session.connection()
+    theirs = or_(Appointment.patient_id.in_(ids), Appointment.doctor_id.in_(ids))
+    appointments = select(Appointment.id).where(theirs)
+    # everyone whose (live or archived) history loses visits
+    patients = union(select(Appointment.patient_id).where(theirs),
+                     select(ArchivedAppointment.patient_id).where(or_(ArchivedAppointment.patient_id.in_(ids),
+                                                                      ArchivedAppointment.doctor_id.in_(ids))))
+    no_sync = {'synchronize_session': False}
+
+    # totals and versions first, while the rows are still there. The version
+    # bump is the transaction's first write, so the counts below are taken under
+    # the write lock (SQLite) or the version:appointments row lock every booking
+    # writer also takes (PostgreSQL): nothing can commit in between and leave
+    # the deltas stale, as in reconcile_counters
+    bump_versions(conn)
+    deltas = {status_key(status): -n for status, n in
+              db.session.query(Appointment.status, func.count())
+              .filter(theirs)
+              .group_by(Appointment.status)}
+    deltas['patients'] = -db.session.query(func.count(User.id)).filter(User.id.in_(ids), User.role == 'patient').scalar()
+    for dept_id, n in (db.session.query(Doctor.dept_id, func.count())
+                       .filter(Doctor.user_id.in_(ids))
+                       .group_by(Doctor.dept_id)):
+        deltas['doctors'] = deltas.get('doctors', 0) - n
+        if dept_id:
+            deltas[dept_key(dept_id)] = -n
+    bump_versions_from(conn, 'doctor', select(Appointment.doctor_id).where(theirs))
+    bump_versions_from(conn, 'patient', patients)
+    was_doctor = deltas.get('doctors', 0) < 0
+
+    # children before parents, so ON DELETE CASCADE never removes rows uncounted
+    db.session.execute(delete(PatientSummary).where(or_(PatientSummary.patient_id.in_(ids),
+                                                        PatientSummary.patient_id.in_(patients))),
+                       execution_options=no_sync)
+    purge_archived(ids)
+    deltas['treatments'] = -db.session.execute(
+        delete(Treatment).where(Treatment.appointment_id.in_(appointments)), execution_options=no_sync).rowcount
+    db.session.execute(update(Slot)
+                       .where(Slot.appointment_id.in_(select(Appointment.id).where(Appointment.patient_id.in_(ids))))
+                       .values(state='open', appointment_id=None), execution_options=no_sync)
+    db.session.execute(delete(Appointment).where(theirs), execution_options=no_sync)
+    db.session.execute(delete(Slot).where(Slot.doctor_id.in_(ids)), execution_options=no_sync)
+    db.session.execute(delete(Doctor).where(Doctor.user_id.in_(ids)), execution_options=no_sync)
+    db.session.execute(delete(User).where(User.id.in_(ids)), execution_options=no_sync)
+
+    apply_deltas(conn, deltas)
+    reindex_users(conn, ids)
+    if was_doctor:
+        directory_changed.send(current_app._get_current_object())
+    db.session.commit()
+    for user_id in ids:
+        forget_session_user(user_id)
+    return ids
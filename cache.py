@@ -0,0 +1,143 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# Small read-through cache. It holds the session_user:<id> snapshots (auth.py)
+# that load_user serves from; departments and doctors live in the lookups.py
+# directory instead. Entries expire after a TTL and the in-process backend
+# evicts least recently used entries past CACHE_MAX_ENTRIES. Writers
+# invalidate keys explicitly after commit (forget_session_user). Config:
+#   CACHE_BACKEND      'memory' (default, per process), 'redis' (shared) or 'null'
+#   CACHE_REDIS_URL    for 'redis': any Redis-compatible server
+#   CACHE_DEFAULT_TTL  seconds (default 300)
+#   CACHE_MAX_ENTRIES  memory backend size (default 1024)
+
+_MISSING = object()
+
+
+class MemoryBackend:
+    name = 'memory'
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value), oldest first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    name = 'redis'
+
+    def __init__(self, client, prefix='hms:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return _MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def __len__(self):
+        return self.client.dbsize()
+
+
+class NullBackend:
+    name = 'null'
+
+    def get(self, key):
+        return _MISSING
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class Cache:
+    def __init__(self):
+        self.backend = MemoryBackend()
+        self.default_ttl = 300
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'memory')
+        app.config.setdefault('CACHE_DEFAULT_TTL', 300)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+
+        backend = app.config['CACHE_BACKEND']
+        if backend == 'memory':
+            self.backend = MemoryBackend(app.config['CACHE_MAX_ENTRIES'])
+        elif backend == 'redis':
+            import redis  # optional dependency, only needed for the shared backend
+            self.backend = RedisBackend(redis.Redis.from_url(app.config['CACHE_REDIS_URL']))
+        elif backend == 'null':
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND {backend!r}")
+
+    # Cached value for `key`, computed by loader() on a miss.
+    # A loader returning None (e.g. row not found) is not cached.
+    def get_or_set(self, key, loader, ttl=None):
+        value = self.backend.get(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = loader()
+        if value is not None:
+            self.backend.set(key, value, ttl or self.default_ttl)
+        return value
+
+    def delete(self, *keys):
+        self.backend.delete(*keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.backend.name,
+            'entries': len(self.backend),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+cache = Cache()
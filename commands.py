@@ -0,0 +1,210 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext, pass_script_info
+from models import db, User, Department
+from counters import reconcile_counters
+from schema import upgrade_schema, explain_routes
+from search import rebuild_search_index
+from exports import stream_export, FORMATS, STATUSES
+from jobs import jobs
+from archive import archive_old_visits
+from timeline import rebuild_summaries
+from bulk import read_doctor_csv, create_doctors, set_blocked, delete_users
+
+# flask --app app <command>. create_app adds every command in COMMANDS to
+# app.cli. Schema changes and seeding only happen here (bootstrap,
+# upgrade-db), never in a web worker; `serve` runs the production server.
+
+DEFAULT_ADMIN = {'name': 'Mr. Admin', 'email': 'admin@hms.com', 'password': 'admin123'}
+DEFAULT_DEPARTMENTS = [
+    ('General', 'General Physician'),
+    ('Cardiology', 'Heart Specialist'),
+    ('Dermatology', 'Skin Specialist'),
+    ('Neurology', 'Brain Specialist'),
+]
+
+
+# One-time setup of a database: schema, the admin user, the default
+# departments and the counters. Safe to run again (only adds what's missing).
+def bootstrap():
+    changes = upgrade_schema()
+    print(f"Applied {len(changes)} schema changes: {', '.join(changes) or '-'}")
+
+    # Creating a Admin if not exist
+    if not User.query.filter_by(role='admin').first():
+        new_admin = User(name=DEFAULT_ADMIN['name'], email=DEFAULT_ADMIN['email'], role='admin')
+        new_admin.set_password(DEFAULT_ADMIN['password'])
+        db.session.add(new_admin)
+        db.session.commit()
+        print('Admin user created!!')
+
+    # Creating some default Departments
+    if not Department.query.first():
+        db.session.add_all([Department(name=name, description=description)
+                            for name, description in DEFAULT_DEPARTMENTS])
+        db.session.commit()
+        print("Default Departments Created!!")
+
+    counts = reconcile_counters()
+    print(f"Reconciled {len(counts)} counters")
+
+
+# CLI: flask --app app bootstrap  (run once per database, before starting workers)
+@click.command('bootstrap')
+@with_appcontext
+def bootstrap_command():
+    bootstrap()
+
+
+# CLI: flask --app app reconcile-counters
+@click.command('reconcile-counters')
+@with_appcontext
+def reconcile_counters_command():
+    counts = reconcile_counters()
+    print(f"Reconciled {len(counts)} counters")
+
+
+# CLI: flask --app app upgrade-db  (adds missing tables/indexes to an existing data.db)
+@click.command('upgrade-db')
+@with_appcontext
+def upgrade_db_command():
+    changes = upgrade_schema()
+    print(f"Applied {len(changes)} schema changes: {', '.join(changes) or '-'}")
+
+
+# CLI: flask --app app rebuild-summaries  (recomputes every patient's history summary)
+@click.command('rebuild-summaries')
+@with_appcontext
+def rebuild_summaries_command():
+    print(f"Rebuilt {rebuild_summaries()} patient summaries")
+
+
+# CLI: flask --app app rebuild-search
+@click.command('rebuild-search')
+@with_appcontext
+def rebuild_search_command():
+    with db.engine.begin() as conn:
+        rebuild_search_index(conn)
+    print("Search index rebuilt")
+
+
+# CLI: flask --app app explain-queries  (fails if a route query scans a large table)
+@click.command('explain-queries')
+@with_appcontext
+def explain_queries_command():
+    report = explain_routes(current_app._get_current_object())
+    if report is None:
+        print("Need at least one appointment and an admin user to explain routes")
+        raise SystemExit(1)
+    failed = 0
+    for url, statement, plan, uses_index in report:
+        if not uses_index:
+            failed += 1
+            print(f"FULL SCAN  {url}\n  {' '.join(statement.split())}")
+            for line in plan:
+                print(f"    {line}")
+    print(f"{len(report) - failed}/{len(report)} route queries use an index")
+    if failed:
+        raise SystemExit(1)
+
+
+# CLI: flask --app app archive-visits [--days 365]  (run from cron)
+@click.command('archive-visits')
+@click.option('--days', type=int, help='archive finished visits older than this (default ARCHIVE_AFTER_DAYS)')
+@with_appcontext
+def archive_visits_command(days):
+    moved = archive_old_visits(days or current_app.config['ARCHIVE_AFTER_DAYS'])
+    print(f"Archived {moved['slots']} slots, {moved['appointments']} appointments, "
+          f"{moved['treatments']} treatments")
+
+
+# CLI: flask --app app work-jobs  (job workers + scheduler in their own process)
+@click.command('work-jobs')
+@with_appcontext
+def work_jobs_command():
+    jobs.start(current_app._get_current_object())
+    print(f"Running {current_app.config['JOB_WORKERS']} job workers, Ctrl+C to stop")
+    jobs.join()
+
+
+# CLI: flask --app app requeue-dead-jobs [ID ...]
+@click.command('requeue-dead-jobs')
+@click.argument('ids', nargs=-1, type=int)
+@with_appcontext
+def requeue_dead_jobs_command(ids):
+    print(f"Requeued {jobs.requeue_dead(ids)} dead jobs")
+
+
+# CLI: flask --app app export-appointments --format ndjson --gzip --start 2024-01-01 -o out.ndjson.gz
+@click.command('export-appointments')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv')
+@click.option('--gzip', is_flag=True, help='gzip the output')
+@click.option('--start', type=click.DateTime(['%Y-%m-%d']), help='first visit date')
+@click.option('--end', type=click.DateTime(['%Y-%m-%d']), help='last visit date')
+@click.option('--doctor', 'doctor_id', type=int)
+@click.option('--dept', 'dept_id', type=int)
+@click.option('--status', type=click.Choice(STATUSES))
+@click.option('-o', '--output', type=click.File('wb'), default='-', help='file to write (default stdout)')
+@with_appcontext
+def export_appointments_command(fmt, gzip, start, end, doctor_id, dept_id, status, output):
+    for chunk in stream_export(fmt, gzip, start=start and start.date(), end=end and end.date(),
+                               doctor_id=doctor_id, dept_id=dept_id, status=status):
+        output.write(chunk)
+
+
+# CLI: flask --app app import-doctors doctors.csv  (columns as on the Add Doctor page; all rows or none)
+@click.command('import-doctors')
+@click.argument('file', type=click.File('r', encoding='utf-8-sig'))
+@with_appcontext
+def import_doctors_command(file):
+    try:
+        rows = read_doctor_csv(file)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    created, errors = create_doctors(rows)
+    for line, message in errors:
+        print(f"line {line}: {message}")
+    if errors:
+        raise click.ClickException(f"Nothing imported, {len(errors)} row(s) need fixing")
+    print(f"Imported {created} doctors")
+
+
+# CLI: flask --app app block-users ID ... [--unblock]
+@click.command('block-users')
+@click.argument('ids', nargs=-1, type=int, required=True)
+@click.option('--unblock', is_flag=True, help='unblock instead of block')
+@with_appcontext
+def block_users_command(ids, unblock):
+    changed = set_blocked(ids, not unblock)
+    print(f"{'Unblocked' if unblock else 'Blocked'} {len(changed)} users")
+
+
+# CLI: flask --app app delete-users ID ... [--yes]  (with all their appointments, slots and history)
+@click.command('delete-users')
+@click.argument('ids', nargs=-1, type=int, required=True)
+@click.confirmation_option('--yes', prompt='Delete these users and all their data?')
+@with_appcontext
+def delete_users_command(ids):
+    print(f"Deleted {len(delete_users(ids))} users")
+
+
+# CLI: flask --app app serve --workers 4 --threads 8  (production server, see server.py)
+@click.command('serve')
+@click.option('--bind', help='address to listen on (default SERVER_BIND)')
+@click.option('--workers', type=int, help='worker processes (default SERVER_WORKERS)')
+@click.option('--threads', type=int, help='request threads per worker (default SERVER_THREADS)')
+@pass_script_info
+def serve_command(info, bind, workers, threads):
+    from server import serve
+
+    app = info.load_app()
+    for name, value in (('SERVER_BIND', bind), ('SERVER_WORKERS', workers), ('SERVER_THREADS', threads)):
+        if value is not None:
+            app.config[name] = value
+    serve(app)
+
+
+COMMANDS = [bootstrap_command, serve_command, reconcile_counters_command, upgrade_db_command, rebuild_summaries_command,
+            rebuild_search_command, explain_queries_command, archive_visits_command, work_jobs_command,
+            requeue_dead_jobs_command, export_appointments_command, import_doctors_command, block_users_command,
+            delete_users_command]
@@ -0,0 +1,212 @@
+import threading
+import time
+from sqlalchemy import event, inspect, func, update, insert, delete, select, literal, cast, case, String, text
+from models import db, User, Doctor, Slot, Appointment, Treatment, Counter, DataVersion, ArchivedAppointment, ArchivedTreatment
+
+# Counter names:
+#   doctors, patients, treatments       -> admin KPI cards
+#   appointments:<status>               -> booked / completed / cancelled
+#   department:<dept_id>:doctors        -> doctors per department
+#
+# Version numbers live in their own table (data_versions) and are never reset:
+#   version:doctor:<id>, version:patient:<id>, version:appointments
+#                                       -> bumped on every slot/appointment change
+#                                          (ETags of the JSON API)
+#   version:directory                   -> departments/doctors changed (lookups.py)
+#
+# Totals change in the same transaction as the rows they count: every ORM flush
+# is inspected and the matching deltas are written to the counters table before
+# the flush goes out. Bulk statements that bypass the ORM are not seen here;
+# reconcile_counters() repairs any drift in the totals, but bulk writes to
+# slots/appointments must call bump_versions() themselves.
+
+
+def dept_key(dept_id):
+    return f"department:{int(dept_id)}:doctors"
+
+
+def status_key(status):
+    return f"appointments:{status}"
+
+
+def version_key(scope, ident=None):
+    return f"version:{scope}" if ident is None else f"version:{scope}:{int(ident)}"
+
+
+# version counters touched by a changed slot/appointment
+def _version_keys(obj, keys):
+    if isinstance(obj, (Slot, Appointment)):
+        keys.add(version_key('appointments'))
+        if obj.doctor_id:
+            keys.add(version_key('doctor', obj.doctor_id))
+    if isinstance(obj, Appointment) and obj.patient_id:
+        keys.add(version_key('patient', obj.patient_id))
+
+
+# deltas contributed by one inserted (sign=1) or deleted (sign=-1) object
+def _row_deltas(obj, sign, deltas):
+    if isinstance(obj, User):
+        # role default is only applied on INSERT
+        if (obj.role or 'patient') == 'patient':
+            deltas['patients'] = deltas.get('patients', 0) + sign
+    elif isinstance(obj, Doctor):
+        deltas['doctors'] = deltas.get('doctors', 0) + sign
+        if obj.dept_id:
+            key = dept_key(obj.dept_id)
+            deltas[key] = deltas.get(key, 0) + sign
+    elif isinstance(obj, Treatment):
+        deltas['treatments'] = deltas.get('treatments', 0) + sign
+    elif isinstance(obj, Appointment):
+        key = status_key(obj.status or 'booked')
+        deltas[key] = deltas.get(key, 0) + sign
+
+
+# deltas from changed columns on already persisted rows
+def _change_deltas(obj, deltas):
+    if isinstance(obj, Appointment):
+        hist = inspect(obj).attrs.status.history
+        if hist.has_changes() and hist.added and hist.deleted:
+            old, new = hist.deleted[0], hist.added[0]
+            if old != new:
+                deltas[status_key(old)] = deltas.get(status_key(old), 0) - 1
+                deltas[status_key(new)] = deltas.get(status_key(new), 0) + 1
+    elif isinstance(obj, Doctor):
+        hist = inspect(obj).attrs.dept_id.history
+        if hist.has_changes():
+            old = hist.deleted[0] if hist.deleted else None
+            new = hist.added[0] if hist.added else None
+            old = int(old) if old else None
+            new = int(new) if new else None
+            if old != new:
+                if old:
+                    deltas[dept_key(old)] = deltas.get(dept_key(old), 0) - 1
+                if new:
+                    deltas[dept_key(new)] = deltas.get(dept_key(new), 0) + 1
+    elif isinstance(obj, User):
+        hist = inspect(obj).attrs.role.history
+        if hist.has_changes() and hist.added and hist.deleted:
+            if hist.deleted[0] == 'patient' and hist.added[0] != 'patient':
+                deltas['patients'] = deltas.get('patients', 0) - 1
+            elif hist.deleted[0] != 'patient' and hist.added[0] == 'patient':
+                deltas['patients'] = deltas.get('patients', 0) + 1
+
+
+# Adds each delta to its row in `table` with one UPDATE for all the keys; keys
+# without a row yet (a new department, doctor or patient) are inserted after it
+def apply_deltas(conn, deltas, table=Counter.__table__):
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    result = conn.execute(update(table)
+                          .where(table.c.name.in_(deltas))
+                          .values(value=table.c.value + case(deltas, value=table.c.name)))
+    if result.rowcount < len(deltas):
+        existing = set(conn.scalars(select(table.c.name).where(table.c.name.in_(deltas))))
+        conn.execute(insert(table), [{'name': name, 'value': delta}
+                                     for name, delta in deltas.items() if name not in existing])
+
+
+@event.listens_for(db.session, 'before_flush')
+def track_counters(session, flush_context, instances):
+    deltas = {}
+    versions = set()
+    for obj in session.new:
+        _row_deltas(obj, 1, deltas)
+        _version_keys(obj, versions)
+    for obj in session.deleted:
+        _row_deltas(obj, -1, deltas)
+        _version_keys(obj, versions)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            _change_deltas(obj, deltas)
+            _version_keys(obj, versions)
+    if any(deltas.values()):
+        apply_deltas(session.connection(), deltas)
+    if versions:
+        apply_deltas(session.connection(), dict.fromkeys(versions, 1), DataVersion.__table__)
+
+
+# For bulk statements on slots/appointments that bypass the ORM (same transaction)
+def bump_versions(conn, doctor_ids=(), patient_ids=()):
+    keys = [version_key('appointments')]
+    keys += [version_key('doctor', d) for d in set(doctor_ids)]
+    keys += [version_key('patient', p) for p in set(patient_ids)]
+    apply_deltas(conn, dict.fromkeys(keys, 1), DataVersion.__table__)
+
+
+# Bumps version:<scope>:<id> for every id selected by `ids` (a one-column
+# select), however many there are, in two statements
+def bump_versions_from(conn, scope, ids):
+    table = DataVersion.__table__
+    ids = ids.subquery()
+    names = select((literal(f"version:{scope}:") + cast(list(ids.c)[0], String)).label('name')).distinct()
+    conn.execute(update(table).where(table.c.name.in_(names)).values(value=table.c.value + 1))
+    missing = names.subquery()
+    conn.execute(insert(table).from_select(
+        ['name', 'value'], select(missing.c.name, literal(1)).where(missing.c.name.not_in(select(table.c.name)))))
+
+
+# Current value of each version key (0 if never bumped), one indexed read
+def get_versions(keys):
+    versions = dict.fromkeys(keys, 0)
+    versions.update(db.session.query(DataVersion.name, DataVersion.value).filter(DataVersion.name.in_(keys)))
+    return versions
+
+
+# All counters as a dict (one indexed read); rebuilt on first use
+def get_counts():
+    counts = dict(db.session.query(Counter.name, Counter.value).all())
+    if not counts:
+        counts = reconcile_counters()
+    return counts
+
+
+# Recomputes every counter from the live (and archived) tables and overwrites
+# the summary table. The write lock on counters is taken before anything is
+# counted and held to the commit, so a delta committed meanwhile is neither
+# lost nor overwritten: on SQLite the DELETE is the transaction's first
+# statement (it waits for, then excludes, other writers); PostgreSQL locks
+# the table, which makes writers' counter UPDATEs wait for this commit.
+def reconcile_counters():
+    db.session.commit()  # start a fresh transaction
+    if db.session.get_bind(mapper=Counter).dialect.name == 'postgresql':
+        db.session.execute(text("LOCK TABLE counters IN EXCLUSIVE MODE"))
+    db.session.execute(delete(Counter))
+
+    counts = {
+        'doctors': Doctor.query.count(),
+        'patients': User.query.filter_by(role='patient').count(),
+        'treatments': Treatment.query.count() + ArchivedTreatment.query.count(),
+    }
+    for status in ('booked', 'completed', 'cancelled'):
+        counts[status_key(status)] = 0
+    for model in (Appointment, ArchivedAppointment):
+        rows = db.session.query(model.status, func.count()).group_by(model.status)
+        for status, n in rows:
+            counts[status_key(status)] += n
+    rows = (db.session.query(Doctor.dept_id, func.count())
+            .filter(Doctor.dept_id.isnot(None))
+            .group_by(Doctor.dept_id))
+    for dept_id, n in rows:
+        counts[dept_key(dept_id)] = n
+
+    db.session.execute(insert(Counter), [{'name': k, 'value': v} for k, v in counts.items()])
+    db.session.commit()
+    return counts
+
+
+# Background thread running reconcile_counters() every `interval` seconds
+def start_reconciler(app, interval):
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    reconcile_counters()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Counter reconciliation failed")
+
+    thread = threading.Thread(target=run, name='counter-reconciler', daemon=True)
+    thread.start()
+    return thread
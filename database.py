@@ -0,0 +1,116 @@
+import os
+from functools import partial, wraps
+from flask import g, has_app_context
+from sqlalchemy import event, insert, select, literal
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.exc import IntegrityError
+from flask_sqlalchemy.session import Session
+
+# Database settings, all overridable from the environment:
+#   DATABASE_URL            primary database (default: sqlite:///data.db)
+#   DATABASE_READ_URL       optional replica for read-only dashboard queries
+#   DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_RECYCLE   connection pool
+#   SQLITE_BUSY_TIMEOUT_MS / SQLITE_MMAP_SIZE / SQLITE_CACHE_SIZE   SQLite pragmas
+
+
+def _env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def default_sqlite_pragmas():
+    return {
+        'journal_mode': 'WAL',       # readers don't block on the writer
+        'synchronous': 'NORMAL',     # fsync at checkpoints only (safe with WAL)
+        'busy_timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'mmap_size': _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+        'cache_size': _env_int('SQLITE_CACHE_SIZE', -64000),  # negative = KiB
+        'foreign_keys': 'ON',        # enforce the REFERENCES / ON DELETE clauses in models.py
+    }
+
+
+def _set_sqlite_pragmas(pragmas, dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+# Fills in database config from the environment (explicit app.config wins),
+# binds `db` to the app and installs the SQLite pragma hook on every engine.
+def init_database(app, db):
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', os.environ.get('DATABASE_URL', 'sqlite:///data.db'))
+    app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
+
+    read_url = os.environ.get('DATABASE_READ_URL')
+    if read_url:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})['read'] = read_url
+
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    for option, env_name in (('pool_size', 'DB_POOL_SIZE'),
+                             ('max_overflow', 'DB_MAX_OVERFLOW'),
+                             ('pool_recycle', 'DB_POOL_RECYCLE')):
+        value = _env_int(env_name)
+        if value is not None:
+            options.setdefault(option, value)
+
+    pragmas = app.config.setdefault('SQLITE_PRAGMAS', default_sqlite_pragmas())
+
+    db.init_app(app)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite' and pragmas:
+                event.listen(engine, 'connect', partial(_set_sqlite_pragmas, pragmas))
+
+
+# Session that sends SELECTs to the 'read' bind while a read_only view runs.
+# Flushes and all writes keep going to the primary.
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing
+                and has_app_context() and g.get('db_read_only')
+                and getattr(clause, 'is_select', False)
+                and 'read' in self._db.engines):
+            return self._db.engines['read']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# View decorator: the view's queries may be served by the read replica
+def read_only(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.db_read_only = False
+    return wrapper
+
+
+# Inserts `rows` into `model`'s table, skipping rows whose `unique_columns`
+# already exist; returns the number inserted. SQLite and PostgreSQL get
+# multi-row INSERT ... ON CONFLICT DO NOTHING (`batch_size` rows each). Any
+# other database inserts row by row, each in a savepoint, and only treats an
+# IntegrityError as a duplicate if a row with those columns is really there.
+def insert_ignoring_duplicates(session, model, rows, unique_columns, batch_size=1000):
+    table = model.__table__
+    dialect = session.get_bind(mapper=model).dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        stmt = {'sqlite': sqlite, 'postgresql': postgresql}[dialect].insert(table)
+        stmt = stmt.on_conflict_do_nothing(index_elements=list(unique_columns))
+        return sum(session.execute(stmt.values(rows[i:i + batch_size])).rowcount
+                   for i in range(0, len(rows), batch_size))
+
+    added = 0
+    for row in rows:
+        try:
+            with session.begin_nested():
+                session.execute(insert(table).values(row))
+            added += 1
+        except IntegrityError:
+            existing = select(literal(1)).select_from(table).where(
+                *(table.c[name] == row[name] for name in unique_columns))
+            if session.execute(existing).first() is None:
+                raise
+    return added
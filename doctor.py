@@ -0,0 +1,225 @@
+from datetime import date, timedelta, datetime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, contains_eager
+from flask import Blueprint, render_template, request, url_for, redirect, flash, abort, current_app
+from flask_login import login_required, current_user
+from models import db, User, Doctor, Slot, Appointment, Treatment
+from database import read_only
+from scheduling import create_slots, delete_open_slots, SHIFTS
+from treatments import treatments_page
+from notifications import appointment_event
+from timeline import visit_page, patient_summary, record_treatment
+
+# Doctor pages: dashboard, visits and treatments, a patient's history and
+# publishing availability (schedule_form is shared with admin's department
+# schedule).
+
+doctor = Blueprint('doctor', __name__)
+
+#############################################################################
+#                            !Doctor Routes          
+#############################################################################
+
+# DOCTOR DASHBOARD
+@doctor.route('/doctor_dashboard')
+@login_required
+@read_only
+def doctor_dashboard():
+    appointments = (
+        Appointment.query
+        .join(Slot) 
+        .options(contains_eager(Appointment.slot),
+                 joinedload(Appointment.patient),
+                 joinedload(Appointment.treatment))
+        .filter(Appointment.doctor_id == current_user.id,
+                Appointment.status == "booked",
+                Slot.date >= date.today())
+        .order_by(Slot.date.asc(), Slot.time.desc())
+        .all())
+    
+    # completed treatments, one page at a time (patient loaded in the same query)
+    treatments, treatments_next = treatments_page(current_user.id, request.args.get('t_after'))
+    return render_template('doctor/doctor_dash.html', appointments=appointments,
+                           treatments=treatments, treatments_next=treatments_next)
+
+
+# MARK APPOINTMENT
+@doctor.route('/mark_appointment/<int:id>', methods=['POST'])
+@login_required
+def mark_appointment(id):
+    ap = Appointment.query.get_or_404(id)
+    if (ap.doctor_id != current_user.id):
+        abort(403)
+    ap.status = 'completed'
+    ap.slot.sync_state(ap)
+    appointment_event(ap, 'completed')
+    db.session.commit()
+    return redirect(request.referrer)
+
+
+# PATIENT HISTORY
+@doctor.route('/patient_history/<int:id>')
+@login_required
+@read_only
+def patient_history(id):
+    patient = User.query.get_or_404(id)
+    # this doctor's visits with the patient, one page at a time; the summary covers all doctors
+    visits, visits_next = visit_page(id, request.args.get('v_after'), doctor_id=current_user.id)
+    return render_template('doctor/patient_history.html', visits=visits, visits_next=visits_next,
+                           summary=patient_summary(id), patient=patient)
+
+
+# ADD TREATMENT DETAILS
+@doctor.route('/add_treatment_details/<int:id>', methods=['GET', 'POST'])
+@login_required
+def add_treatment_details(id):
+    appointment = Appointment.query.get_or_404(id)
+
+    if appointment.doctor_id != current_user.id:
+        abort(403)
+
+    if appointment.slot.date != date.today():
+        flash('You cannot add Treatment details of future appointments!', 'danger')
+        return redirect(url_for('doctor.doctor_dashboard'))
+
+    if request.method == 'POST':
+        visit_type = request.form.get('visit')
+        tests = request.form.get('test')
+        diagnosis = request.form.get('diagnosis')
+        medicines = request.form.get('medicines')
+        prescription = request.form.get('prescription')
+
+        # New Treatment
+        treatment = Treatment(
+            appointment_id=appointment.id,
+            visit_type=visit_type,
+            tests_done=tests,
+            diagnosis=diagnosis,
+            medicines=medicines,
+            prescription=prescription
+        )
+
+        db.session.add(treatment)
+        record_treatment(appointment, treatment)
+        appointment_event(appointment, 'treatment')
+        db.session.commit()
+        
+        flash('Treatment details added successfully!', 'success')
+        return redirect(url_for('doctor.doctor_dashboard'))
+
+    return render_template('doctor/treatment_form.html', appointment=appointment)
+
+
+# UPDATE AVAILABILITY (doctor/admin)
+@doctor.route('/update_availability/<int:user_id>', methods=['GET', 'POST'])
+@login_required
+def update_availability(user_id):
+    doctor = Doctor.query.get_or_404(user_id)
+
+    # Authorization Check
+    if current_user.role not in ['admin', 'doctor']:
+        abort(403)
+    if current_user.role == 'doctor' and current_user.id != user_id:
+        abort(403)
+
+    if request.method == 'POST':
+        date_str = request.form.get('date') 
+        time_slot = request.form.get('time') 
+        
+        slot_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+
+        # Validation
+        if slot_date < date.today():
+            flash("You cannot add availability for past dates!", "warning")
+            return redirect(url_for('doctor.update_availability', user_id=user_id))
+        
+        horizon = current_app.config['SCHEDULE_HORIZON_DAYS']
+        if slot_date >= (date.today() + timedelta(days=horizon)):
+            flash(f"You can only add availability for upcoming {horizon} days!", "warning")
+            return redirect(url_for('doctor.update_availability', user_id=user_id))
+
+        try:
+            new_slot = Slot(doctor_id=user_id, date=slot_date, time=time_slot)
+            db.session.add(new_slot)
+            db.session.commit()
+            flash("Slot added successfully!", "success")
+        except IntegrityError:
+            db.session.rollback()
+            flash("You have already added this slot!", "danger")
+        
+        return redirect(url_for('doctor.update_availability', user_id=user_id))
+
+    # Existing slots
+    slots = Slot.query.filter(
+        Slot.doctor_id == user_id, 
+        Slot.date >= date.today()
+    ).order_by(Slot.date).all()
+    
+    return render_template('doctor/update_availability.html', slots=slots, today=date.today(), doctor=doctor,
+                           horizon=current_app.config['SCHEDULE_HORIZON_DAYS'])
+
+
+# Recurring schedule form (start/end date, weekdays, shifts) -> tuple, or None after flashing the problem
+def schedule_form():
+    try:
+        start = datetime.strptime(request.form.get('start') or '', '%Y-%m-%d').date()
+        end = datetime.strptime(request.form.get('end') or '', '%Y-%m-%d').date()
+    except ValueError:
+        flash("Please choose a start and end date!", "warning")
+        return None
+    weekdays = {int(d) for d in request.form.getlist('weekday') if d.isdigit()}
+    shifts = [s for s in SHIFTS if s in request.form.getlist('shift')]
+    horizon = current_app.config['SCHEDULE_HORIZON_DAYS']
+
+    # Validation
+    if start < date.today():
+        flash("You cannot add availability for past dates!", "warning")
+    elif end >= (date.today() + timedelta(days=horizon)):
+        flash(f"You can only add availability for upcoming {horizon} days!", "warning")
+    elif start > end:
+        flash("Start date must be before end date!", "warning")
+    elif not weekdays or not shifts:
+        flash("Select at least one weekday and one shift!", "warning")
+    else:
+        return start, end, weekdays, shifts
+    return None
+
+
+# BULK AVAILABILITY (doctor/admin): weekly pattern over a date range
+@doctor.route('/bulk_availability/<int:user_id>', methods=['POST'])
+@login_required
+def bulk_availability(user_id):
+    Doctor.query.get_or_404(user_id)
+
+    # Authorization Check
+    if current_user.role not in ['admin', 'doctor']:
+        abort(403)
+    if current_user.role == 'doctor' and current_user.id != user_id:
+        abort(403)
+
+    pattern = schedule_form()
+    if pattern:
+        created, skipped = create_slots([user_id], *pattern)
+        flash(f"{created} slots added, {skipped} already existed.", "success")
+
+    return redirect(url_for('doctor.update_availability', user_id=user_id))
+
+
+# DELETE SLOT
+@doctor.route('/delete_slot/<int:id>', methods=['POST'])
+@login_required
+def delete_slot(id):
+    slot = Slot.query.get_or_404(id)
+
+    if current_user.role != 'admin' and current_user.id != slot.doctor_id:
+        abort(403)
+
+    doctor_id = slot.doctor_id
+    if slot.state != 'open' or not delete_open_slots([id]):
+        flash("Cannot delete this slot because it is booked!", "danger")
+    else:
+        flash("Slot removed successfully", "success")
+
+    return redirect(url_for('doctor.update_availability', user_id=doctor_id))
+
+
@@ -0,0 +1,115 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from models import (db, User, Doctor, Department, Slot, Appointment, Treatment,
+                    ArchivedSlot, ArchivedAppointment, ArchivedTreatment)
+
+# Appointment exports for audits/reporting. One flat row per appointment (with
+# its slot, patient, doctor, department and treatment), archived ones included,
+# read with yield_per so rows arrive from the database cursor in fixed-size
+# batches and are written out as CSV or NDJSON chunk by chunk, optionally
+# gzipped. Nothing holds more
+# than one batch, so memory stays flat however many rows are exported.
+
+FORMATS = ('csv', 'ndjson')
+STATUSES = ('booked', 'completed', 'cancelled')
+
+# rows fetched per database round trip / encoded per output chunk
+BATCH_SIZE = 1000
+
+_patient = aliased(User, name='patient')
+_doctor = aliased(User, name='doctor_user')
+
+HEADER = ['appointment_id', 'status', 'date', 'time', 'patient_id', 'patient_name', 'patient_email',
+          'doctor_id', 'doctor_name', 'department', 'booked_at', 'visit_type', 'tests_done',
+          'diagnosis', 'prescription', 'medicines', 'treated_at']
+
+# live tables, then the archive (archive.py) with the same columns
+SOURCES = ((Appointment, Slot, Treatment), (ArchivedAppointment, ArchivedSlot, ArchivedTreatment))
+
+
+def _columns(ap, slot, tr):
+    return [ap.id, ap.status, slot.date, slot.time, ap.patient_id, _patient.name, _patient.email,
+            ap.doctor_id, _doctor.name, Department.name, ap.created_at, tr.visit_type, tr.tests_done,
+            tr.diagnosis, tr.prescription, tr.medicines, tr.created_at]
+
+
+# start/end: visit dates (inclusive); any filter left as None is not applied
+def export_query(start=None, end=None, doctor_id=None, dept_id=None, status=None, source=SOURCES[0]):
+    ap, slot, tr = source
+    query = (select(*(col.label(name) for name, col in zip(HEADER, _columns(ap, slot, tr))))
+             .select_from(ap)
+             .join(slot, slot.id == ap.slot_id)
+             .join(_patient, _patient.id == ap.patient_id)
+             .join(Doctor, Doctor.user_id == ap.doctor_id)
+             .join(_doctor, _doctor.id == Doctor.user_id)
+             .outerjoin(Department, Department.id == Doctor.dept_id)
+             .outerjoin(tr, tr.appointment_id == ap.id))
+    if start:
+        query = query.where(slot.date >= start)
+    if end:
+        query = query.where(slot.date <= end)
+    if doctor_id:
+        query = query.where(ap.doctor_id == doctor_id)
+    if dept_id:
+        query = query.where(Doctor.dept_id == dept_id)
+    if status:
+        query = query.where(ap.status == status)
+    return query.order_by(ap.id)
+
+
+# archived rows first (they are the older ones), then the live tables
+def export_rows(**filters):
+    for source in reversed(SOURCES):
+        result = db.session.execute(export_query(**filters, source=source),
+                                    execution_options={'yield_per': BATCH_SIZE})
+        for batch in result.partitions():
+            yield batch
+
+
+def _value(v):
+    return v.isoformat() if isinstance(v, (date, datetime)) else v
+
+
+def _csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for batch in batches:
+        writer.writerows([_value(v) for v in row] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(batches):
+    for batch in batches:
+        yield ''.join(json.dumps(dict(zip(HEADER, map(_value, row)))) + '\n' for row in batch)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# Export as an iterator of bytes chunks (for a streamed response or a file)
+def stream_export(fmt='csv', gzip=False, **filters):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    encode = _csv_chunks if fmt == 'csv' else _ndjson_chunks
+    chunks = (text.encode('utf-8') for text in encode(export_rows(**filters)))
+    return _gzipped(chunks) if gzip else chunks
+
+
+def export_filename(fmt, gzip=False):
+    return f"appointments-{date.today().isoformat()}.{fmt}" + ('.gz' if gzip else '')
@@ -0,0 +1,32 @@
+from flask import Blueprint, jsonify
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, User
+
+# Health checks for the process manager / load balancer (no login).
+#   /healthz   the worker is up and serving requests (touches nothing else)
+#   /readyz    every database bind answers and has the schema (bootstrap ran);
+#              503 otherwise, so the worker gets no traffic until it can serve
+
+health = Blueprint('health', __name__)
+
+
+# HEALTHZ
+@health.route('/healthz')
+def healthz():
+    return jsonify({'status': 'ok'})
+
+
+# READYZ
+@health.route('/readyz')
+def readyz():
+    checks = {}
+    for bind, engine in db.engines.items():
+        try:
+            with engine.connect() as conn:
+                conn.execute(select(User.id).limit(1))
+            checks[bind or 'primary'] = 'ok'
+        except SQLAlchemyError as e:
+            checks[bind or 'primary'] = type(getattr(e, 'orig', None) or e).__name__
+    ready = all(status == 'ok' for status in checks.values())
+    return jsonify({'status': 'ready' if ready else 'unavailable', 'checks': checks}), 200 if ready else 503
@@ -0,0 +1,223 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, update, delete, func
+from models import db, Job
+from database import insert_ignoring_duplicates
+
+# Background jobs persisted in the `jobs` table, so they survive restarts.
+# enqueue() adds a job to the caller's session: it is committed (or rolled
+# back) together with the request's own changes and the request returns
+# straight away. Worker threads claim due jobs with a conditional UPDATE
+# (queued -> running, like booking.py), run the handler registered for the
+# job's kind in an app context and commit its writes together with the
+# 'done' status. A failing job is retried with exponential backoff and after
+# max_attempts it is dead-lettered (status 'dead', kept with its last error
+# until requeued). Jobs with the same idempotency key are only stored once.
+# A scheduler thread requeues jobs whose worker died, drops finished jobs
+# after JOB_KEEP_DAYS and calls the functions registered with @scheduled.
+# Config:
+#   JOB_WORKERS          worker threads per process (default 2)
+#   JOB_POLL_SECONDS     idle wait between polls (default 1; commits wake workers sooner)
+#   JOB_MAX_ATTEMPTS     attempts before dead-lettering (default 5)
+#   JOB_RETRY_SECONDS    first retry delay, doubled on every attempt (default 10)
+#   JOB_LEASE_SECONDS    running jobs older than this are requeued (default 300)
+#   JOB_KEEP_DAYS        finished jobs kept this long, and so the key window (default 7)
+#   JOB_SCHEDULE_SECONDS scheduler tick (default 60)
+
+logger = logging.getLogger('hms.jobs')
+
+
+class JobQueue:
+    def __init__(self):
+        self.handlers = {}
+        self.schedules = []
+        self.wake = threading.Event()
+        self._threads = []
+
+    def init_app(self, app):
+        app.config.setdefault('JOB_WORKERS', 2)
+        app.config.setdefault('JOB_POLL_SECONDS', 1.0)
+        app.config.setdefault('JOB_MAX_ATTEMPTS', 5)
+        app.config.setdefault('JOB_RETRY_SECONDS', 10)
+        app.config.setdefault('JOB_LEASE_SECONDS', 300)
+        app.config.setdefault('JOB_KEEP_DAYS', 7)
+        app.config.setdefault('JOB_SCHEDULE_SECONDS', 60)
+        app.extensions['jobs'] = self
+
+    # @jobs.handler('kind'): fn(**payload) runs the job; raise to retry
+    def handler(self, kind):
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    # @jobs.scheduled: fn() runs on every scheduler tick (enqueue with a key to run once)
+    def scheduled(self, fn):
+        self.schedules.append(fn)
+        return fn
+
+    # Adds jobs to the current session (committed by the caller). `jobs` is a
+    # list of (kind, payload, key); rows whose key already exists are skipped.
+    # Returns the number of new jobs. Works in apps without init_app (the
+    # benchmarks) too: the workers are what need it, not the request path.
+    def enqueue_many(self, jobs, delay=0):
+        if not jobs:
+            return 0
+        now = datetime.now()
+        rows = [{'kind': kind, 'payload': json.dumps(payload), 'key': key, 'status': 'queued',
+                 'attempts': 0, 'max_attempts': current_app.config.get('JOB_MAX_ATTEMPTS', 5),
+                 'run_at': now + timedelta(seconds=delay), 'created_at': now}
+                for kind, payload, key in jobs]
+        added = insert_ignoring_duplicates(db.session, Job, rows, ['key'])
+        if added:
+            db.session.info['jobs_enqueued'] = True
+        return added
+
+    def enqueue(self, kind, payload=None, key=None, delay=0):
+        return self.enqueue_many([(kind, payload or {}, key)], delay=delay) == 1
+
+    ## Workers
+
+    def start(self, app):
+        self.app = app
+        for i in range(app.config['JOB_WORKERS']):
+            self._spawn(self._work, f'job-worker-{i}')
+        self._spawn(self._schedule, 'job-scheduler')
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job = None
+            with self.app.app_context():
+                try:
+                    job = self.claim()
+                    if job:
+                        self.run(job)
+                        continue
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Job worker failed")
+            if job is None:
+                self.wake.wait(self.app.config['JOB_POLL_SECONDS'])
+                self.wake.clear()
+
+    # Next due job, now marked running; None if nothing is due, False if another worker took it
+    def claim(self):
+        now = datetime.now()
+        job_id = (db.session.query(Job.id)
+                  .filter(Job.status == 'queued', Job.run_at <= now)
+                  .order_by(Job.run_at)
+                  .limit(1)
+                  .scalar())
+        if job_id is None:
+            db.session.rollback()
+            return None
+        won = db.session.execute(update(Job)
+                                 .where(Job.id == job_id, Job.status == 'queued')
+                                 .values(status='running', locked_at=now, attempts=Job.attempts + 1)
+                                 .execution_options(synchronize_session=False)).rowcount
+        db.session.commit()
+        return db.session.get(Job, job_id) if won else False
+
+    def run(self, job):
+        job_id, kind = job.id, job.kind
+        try:
+            handler = self.handlers.get(kind)
+            if handler is None:
+                raise LookupError(f"No handler for job kind {kind!r}")
+            handler(**json.loads(job.payload))
+            job.status = 'done'
+            job.last_error = None
+            job.finished_at = datetime.now()
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            job.last_error = f"{type(e).__name__}: {e}"[:2000]
+            if job.attempts >= job.max_attempts:
+                job.status = 'dead'
+                job.finished_at = datetime.now()
+                logger.error("Job %s (%s) dead after %s attempts: %s", job_id, kind, job.attempts, job.last_error)
+            else:
+                job.status = 'queued'
+                delay = self.app.config['JOB_RETRY_SECONDS'] * 2 ** (job.attempts - 1)
+                job.run_at = datetime.now() + timedelta(seconds=delay)
+                logger.warning("Job %s (%s) failed, retry in %ss: %s", job_id, kind, delay, job.last_error)
+            db.session.commit()
+
+    ## Scheduler
+
+    def _schedule(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    self.tick()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("Job scheduler failed")
+            time.sleep(self.app.config['JOB_SCHEDULE_SECONDS'])
+
+    def tick(self):
+        now = datetime.now()
+        config = self.app.config
+        # jobs whose worker died mid-run go back to the queue (they count as an attempt)
+        db.session.execute(update(Job)
+                           .where(Job.status == 'running',
+                                  Job.locked_at < now - timedelta(seconds=config['JOB_LEASE_SECONDS']))
+                           .values(status='queued', run_at=now)
+                           .execution_options(synchronize_session=False))
+        db.session.execute(delete(Job)
+                           .where(Job.status == 'done',
+                                  Job.finished_at < now - timedelta(days=config['JOB_KEEP_DAYS']))
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+        for fn in self.schedules:
+            fn()
+            db.session.commit()
+
+    ## Monitoring / dead letters
+
+    def stats(self):
+        counts = dict(db.session.query(Job.status, func.count()).group_by(Job.status).all())
+        dead = (Job.query.filter_by(status='dead')
+                .order_by(Job.finished_at.desc())
+                .limit(20))
+        return {
+            'counts': counts,
+            'dead': [{'id': j.id, 'kind': j.kind, 'key': j.key, 'attempts': j.attempts,
+                      'error': j.last_error, 'finished_at': j.finished_at.isoformat()} for j in dead],
+        }
+
+    # puts dead-lettered jobs (all, or the given ids) back in the queue with fresh attempts
+    def requeue_dead(self, ids=None):
+        stmt = update(Job).where(Job.status == 'dead')
+        if ids:
+            stmt = stmt.where(Job.id.in_(ids))
+        count = db.session.execute(stmt.values(status='queued', attempts=0, run_at=datetime.now(),
+                                               finished_at=None)
+                                   .execution_options(synchronize_session=False)).rowcount
+        db.session.info['jobs_enqueued'] = True
+        db.session.commit()
+        return count
+
+
+jobs = JobQueue()
+
+
+# wake a worker as soon as a transaction that enqueued something commits
+@event.listens_for(db.session, 'after_commit')
+def _wake_workers(session):
+    if session.info.pop('jobs_enqueued', False):
+        jobs.wake.set()
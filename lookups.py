@@ -0,0 +1,139 @@
+import threading
+import time
+from blinker import Namespace
+from flask import current_app
+from sqlalchemy import event, null, select, union_all
+from models import db, User, Doctor, Department, DataVersion
+from counters import apply_deltas, get_versions, version_key
+
+# Department/doctor directory for patient-facing pages and the API: every
+# department with its doctors and their display names, held in memory as
+# small __slots__ records and shared by all requests of the process. It is
+# built in one query and then served without touching the database until it
+# changes. Writers send `directory_changed` before committing (add_department,
+# add_doctor, edit_doctor, delete_user, a doctor's edit_profile): that bumps
+# version:directory in the same transaction and, after the commit, drops this
+# process's snapshot. Other processes compare version:directory at most every
+# DIRECTORY_CHECK_SECONDS (default 5) and rebuild when it moved.
+# The records are shared: read them, never modify them.
+
+signals = Namespace()
+directory_changed = signals.signal('directory-changed')
+
+DIRECTORY_VERSION = version_key('directory')
+
+
+class DepartmentEntry:
+    __slots__ = ('id', 'name', 'description', 'doctors')
+
+    def __init__(self, id, name, description):
+        self.id = id
+        self.name = name
+        self.description = description
+        self.doctors = []
+
+
+class DoctorEntry:
+    __slots__ = ('user_id', 'name', 'description', 'department')
+
+    def __init__(self, user_id, name, description, department):
+        self.user_id = user_id
+        self.name = name
+        self.description = description
+        self.department = department
+
+
+class Directory:
+    __slots__ = ('version', 'departments', 'by_id', 'doctors')
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.by_id = {}
+        self.doctors = {}
+        for dept_id, dept_name, dept_description, user_id, name, description in rows:
+            dept = None
+            if dept_id is not None:
+                dept = self.by_id.get(dept_id)
+                if dept is None:
+                    dept = self.by_id[dept_id] = DepartmentEntry(dept_id, dept_name, dept_description)
+            if user_id is not None:
+                doctor = self.doctors[user_id] = DoctorEntry(user_id, name, description, dept)
+                if dept is not None:
+                    dept.doctors.append(doctor)
+        for dept in self.by_id.values():
+            dept.doctors = tuple(dept.doctors)
+        self.departments = tuple(self.by_id.values())
+
+
+# departments left-joined to their doctors, plus the doctors without one (a
+# FULL OUTER JOIN would do both, but needs SQLite 3.39+)
+def _directory_rows():
+    doctors = Doctor.__table__.join(User.__table__, User.id == Doctor.user_id)
+    rows = union_all(
+        select(Department.id.label('dept_id'), Department.name.label('dept_name'),
+               Department.description.label('dept_description'), Doctor.user_id, User.name, Doctor.description)
+        .select_from(Department.__table__)
+        .outerjoin(doctors, Doctor.dept_id == Department.id),
+        select(null(), null(), null(), Doctor.user_id, User.name, Doctor.description)
+        .select_from(doctors)
+        .where(Doctor.dept_id.is_(None)))
+    return db.session.execute(rows.order_by(rows.selected_columns.dept_id, rows.selected_columns.user_id)).all()
+
+
+class DirectoryCache:
+    def __init__(self):
+        self.snapshot = None
+        self.checked_at = 0.0
+        self.rebuilds = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        snapshot = self.snapshot
+        interval = current_app.config['DIRECTORY_CHECK_SECONDS']
+        if snapshot is not None and time.monotonic() - self.checked_at < interval:
+            return snapshot
+        with self._lock:
+            if self.snapshot is not None and time.monotonic() - self.checked_at < interval:
+                return self.snapshot
+            version = get_versions([DIRECTORY_VERSION])[DIRECTORY_VERSION]
+            if self.snapshot is None or self.snapshot.version != version:
+                self.snapshot = Directory(version, _directory_rows())
+                self.rebuilds += 1
+            self.checked_at = time.monotonic()
+            return self.snapshot
+
+    def drop(self):
+        with self._lock:
+            self.snapshot = None
+
+
+directory = DirectoryCache()
+
+
+@directory_changed.connect
+def _bump_directory(sender, **extra):
+    apply_deltas(db.session.connection(), {DIRECTORY_VERSION: 1}, DataVersion.__table__)
+    db.session.info['directory_changed'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _drop_directory(session):
+    if session.info.pop('directory_changed', False):
+        directory.drop()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_directory_change(session):
+    session.info.pop('directory_changed', None)
+
+
+def department_list():
+    return directory.get().departments
+
+
+def department_info(dept_id):
+    return directory.get().by_id.get(dept_id)
+
+
+def doctor_info(doctor_id):
+    return directory.get().doctors.get(doctor_id)
@@ -1,9 +1,13 @@
 from datetime import datetime
+from collections import namedtuple
+from sqlalchemy import text
 from flask_sqlalchemy import SQLAlchemy
-from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import abort
+from flask_login import UserMixin, logout_user
+from database import RoutingSession
+from passwords import hasher
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # USERS
 class User(db.Model, UserMixin):
@@ -19,15 +23,57 @@ class User(db.Model, UserMixin):
     created_at = db.Column(db.DateTime, default=datetime.now, nullable=True)
 
     # relationships
-    doctor_profile = db.relationship("Doctor", back_populates="user", uselist=False, cascade="all, delete-orphan")
-    appointments = db.relationship("Appointment", back_populates="patient", cascade="all, delete-orphan")
+    # passive_deletes: deleting a parent leaves unloaded children to the database
+    # (ON DELETE CASCADE, foreign_keys pragma in database.py) instead of loading
+    # them; routes delete whole subgraphs set-based (bulk.py, scheduling.py)
+    doctor_profile = db.relationship("Doctor", back_populates="user", uselist=False,
+                                     cascade="all, delete-orphan", passive_deletes=True)
+    appointments = db.relationship("Appointment", back_populates="patient",
+                                   cascade="all, delete-orphan", passive_deletes=True)
+    summary = db.relationship("PatientSummary", uselist=False,
+                              cascade="all, delete-orphan", passive_deletes=True)
 
-    # helpers 
+    __table_args__ = (
+        # patient lists / counts on admin dashboard (rowid keeps keyset order)
+        db.Index("ix_users_role", "role"),
+    )
+
+    # helpers (hashing runs in the passwords.py process pool)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return hasher.verify(self.password_hash, password)
+
+    # hash made with an older PASSWORD_HASH_METHOD / cost
+    def password_needs_rehash(self):
+        return hasher.needs_rehash(self.password_hash)
+
+
+# SESSION USER
+# immutable snapshot of the columns every request needs (what login_manager loads);
+# anything else (doctor_profile, email, ...) falls through to the full row on first use
+class SessionUser(namedtuple("SessionUser", "id name role is_blocked"), UserMixin):
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, user):
+        return cls(user.id, user.name, user.role, user.is_blocked)
+
+    # the full row; gone if the user was deleted while this snapshot was still
+    # cached (possibly by another worker): sign the session out instead of a 500
+    @property
+    def row(self):
+        user = db.session.get(User, self.id)
+        if user is None:
+            logout_user()
+            abort(401)
+        return user
+
+    def __getattr__(self, attr):
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.row, attr)
 
 
 # DEPARTMENTS / SPECIALIZATIONS
@@ -52,11 +98,16 @@ class Doctor(db.Model):
     # relationships
     user = db.relationship("User", back_populates="doctor_profile")
     department = db.relationship("Department", back_populates="doctors")
-    slots = db.relationship("Slot", back_populates="doctor", cascade="all, delete-orphan")
-    appointments = db.relationship("Appointment", back_populates="doctor", cascade="all, delete-orphan")
+    slots = db.relationship("Slot", back_populates="doctor",
+                            cascade="all, delete-orphan", passive_deletes=True)
+    appointments = db.relationship("Appointment", back_populates="doctor",
+                                   cascade="all, delete-orphan", passive_deletes=True)
 
 
 # SLOTS
+# slot state for each status of its current appointment
+SLOT_STATE = {"booked": "booked", "completed": "completed", "cancelled": "open"}
+
 class Slot(db.Model):
     __tablename__ = "slots"
 
@@ -65,16 +116,41 @@ class Slot(db.Model):
     date = db.Column(db.Date, nullable=False)
     time = db.Column(db.String(20), nullable=False) # morning: 8am - 12am, evening: 4pm - 9pm
     created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    # occupancy (mirrors the latest appointment on this slot)
+    state = db.Column(db.String(20), default="open", server_default="open", nullable=False)  # open, booked, completed
+    appointment_id = db.Column(db.Integer, nullable=True)  # latest appointment (kept after cancellation)
 
     # relationships
     doctor = db.relationship("Doctor", back_populates="slots")
-    appointments = db.relationship("Appointment", back_populates="slot", cascade="all, delete-orphan")
+    appointments = db.relationship("Appointment", back_populates="slot",
+                                   cascade="all, delete-orphan", passive_deletes=True)
+    current_appointment = db.relationship("Appointment",
+                                          primaryjoin="foreign(Slot.appointment_id) == Appointment.id",
+                                          post_update=True)
 
     __table_args__ = (
         # preventing identical slots for same doctor/date/period
+        # (also the index for per-doctor date ranges: check_availability, update_availability)
         db.UniqueConstraint("doctor_id", "date", "time", name="unique_slot"),
+        # all-doctor date ranges ordered by date, shift (admin dashboard)
+        db.Index("ix_slots_date_time", "date", text("time DESC")),
+        # reopening slots of deleted appointments
+        db.Index("ix_slots_appointment", "appointment_id"),
+        # open slots only, in ranking order (earliest-open-slot search)
+        db.Index("ix_slots_open", "date", text("time DESC"), "doctor_id",
+                 sqlite_where=text("state = 'open'"), postgresql_where=text("state = 'open'")),
     )
 
+    # helpers
+    def occupy(self, appointment):
+        self.current_appointment = appointment
+        self.state = SLOT_STATE[appointment.status or "booked"]
+
+    # re-sync after `appointment` changed status (no-op if it is not the current one)
+    def sync_state(self, appointment):
+        if self.current_appointment is appointment:
+            self.state = SLOT_STATE[appointment.status]
+
 
 # Appointments
 class Appointment(db.Model):
@@ -86,16 +162,31 @@ class Appointment(db.Model):
     slot_id = db.Column(db.Integer, db.ForeignKey("slots.id", ondelete="CASCADE"), nullable=False)
     status = db.Column(db.String(20), default="booked", nullable=False)  # booked, completed, cancelled
     created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    # last status change through the ORM (incremental dashboard refresh); NULL on rows older than the column
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, nullable=True)
 
     # relationships
     patient = db.relationship("User", back_populates="appointments")
     doctor = db.relationship("Doctor", back_populates="appointments")
     slot = db.relationship("Slot", back_populates="appointments")
-    treatment = db.relationship("Treatment", back_populates="appointment", uselist=False, cascade="all, delete-orphan")
+    treatment = db.relationship("Treatment", back_populates="appointment", uselist=False,
+                                cascade="all, delete-orphan", passive_deletes=True)
 
     __table_args__ = (
         # preventing same patient booking same slot twice
         db.UniqueConstraint("patient_id", "slot_id", name="uq_patient_slot"),
+        # current occupant of a slot (check_availability, delete_slot)
+        db.Index("ix_appointments_slot_status", "slot_id", "status"),
+        # completed visits of a patient (history)
+        db.Index("ix_appointments_patient_status", "patient_id", "status"),
+        # completed visits of a doctor (doctor_dashboard treatments, patient_history)
+        db.Index("ix_appointments_doctor_status", "doctor_id", "status", "patient_id"),
+        # upcoming booked appointments of a doctor (doctor_dashboard)
+        db.Index("ix_appointments_doctor_booked", "doctor_id", "slot_id",
+                 sqlite_where=text("status = 'booked'"),
+                 postgresql_where=text("status = 'booked'")),
+        # a doctor's appointments changed since a point in time (doctor treatments delta)
+        db.Index("ix_appointments_doctor_updated", "doctor_id", "updated_at"),
     )
 
 
@@ -113,4 +204,132 @@ class Treatment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
 
     # relationships
-    appointment = db.relationship("Appointment", back_populates="treatment")
\ No newline at end of file
+    appointment = db.relationship("Appointment", back_populates="treatment")
+
+    __table_args__ = (
+        db.Index("ix_treatments_appointment", "appointment_id"),
+        # newest-first treatment lists
+        db.Index("ix_treatments_created_at", "created_at"),
+    )
+
+# COUNTERS (running totals for dashboard cards, maintained by counters.py)
+class Counter(db.Model):
+    __tablename__ = "counters"
+
+    name = db.Column(db.String(60), primary_key=True)  # e.g. 'doctors', 'appointments:booked', 'department:3:doctors'
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+
+# DATA VERSIONS (bumped on every change to what they name, see counters.py; ETags)
+class DataVersion(db.Model):
+    __tablename__ = "data_versions"
+
+    name = db.Column(db.String(60), primary_key=True)  # e.g. 'version:doctor:3'
+    value = db.Column(db.Integer, default=0, nullable=False)
+
+
+# PATIENT SUMMARIES (medical-history digest per patient, kept up to date by timeline.py)
+class PatientSummary(db.Model):
+    __tablename__ = "patient_summaries"
+
+    patient_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    visits = db.Column(db.Integer, default=0, nullable=False)  # visits with treatment details
+    last_visit = db.Column(db.Date, nullable=True)
+    departments = db.Column(db.Text, default="{}", nullable=False)  # JSON {department: visits}
+    diagnoses = db.Column(db.Text, default="{}", nullable=False)  # JSON {diagnosis: times}
+    medicines = db.Column(db.Text, default="[]", nullable=False)  # JSON, most recent first
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
+
+
+# JOBS (background job queue, see jobs.py)
+class Job(db.Model):
+    __tablename__ = "jobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(60), nullable=False)  # handler name, e.g. 'notify'
+    payload = db.Column(db.Text, nullable=False, default="{}")  # JSON keyword arguments
+    key = db.Column(db.String(120), unique=True, nullable=True)  # idempotency key
+    status = db.Column(db.String(20), default="queued", nullable=False)  # queued, running, done, dead
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=5, nullable=False)
+    run_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # next due job / stale running jobs / old finished jobs
+        db.Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
+
+
+# ARCHIVE (completed/cancelled visits past ARCHIVE_AFTER_DAYS, moved by archive.py)
+# Same columns and ids as the live tables, so templates can render either kind.
+class ArchivedSlot(db.Model):
+    __tablename__ = "archived_slots"
+
+    id = db.Column(db.Integer, primary_key=True)
+    doctor_id = db.Column(db.Integer, db.ForeignKey("doctors.user_id", ondelete="CASCADE"), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    time = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    state = db.Column(db.String(20), nullable=False)
+    appointment_id = db.Column(db.Integer, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+    # relationships
+    doctor = db.relationship("Doctor", viewonly=True)
+    appointments = db.relationship("ArchivedAppointment", back_populates="slot")
+
+    __table_args__ = (
+        db.Index("ix_archived_slots_doctor", "doctor_id"),
+    )
+
+
+class ArchivedAppointment(db.Model):
+    __tablename__ = "archived_appointments"
+
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    doctor_id = db.Column(db.Integer, db.ForeignKey("doctors.user_id", ondelete="CASCADE"), nullable=False)
+    slot_id = db.Column(db.Integer, db.ForeignKey("archived_slots.id", ondelete="CASCADE"), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+    # relationships
+    patient = db.relationship("User", viewonly=True)
+    doctor = db.relationship("Doctor", viewonly=True)
+    slot = db.relationship("ArchivedSlot", back_populates="appointments")
+    treatment = db.relationship("ArchivedTreatment", back_populates="appointment", uselist=False)
+
+    __table_args__ = (
+        # history
+        db.Index("ix_archived_appointments_patient_status", "patient_id", "status"),
+        # patient_history, deleting a doctor
+        db.Index("ix_archived_appointments_doctor_patient", "doctor_id", "patient_id"),
+        db.Index("ix_archived_appointments_slot", "slot_id"),
+    )
+
+
+class ArchivedTreatment(db.Model):
+    __tablename__ = "archived_treatments"
+
+    id = db.Column(db.Integer, primary_key=True)
+    appointment_id = db.Column(db.Integer, db.ForeignKey("archived_appointments.id", ondelete="CASCADE"), nullable=False)
+    visit_type = db.Column(db.String(50))
+    tests_done = db.Column(db.Text)
+    diagnosis = db.Column(db.Text)
+    prescription = db.Column(db.Text)
+    medicines = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+    # relationships
+    appointment = db.relationship("ArchivedAppointment", back_populates="treatment")
+
+    __table_args__ = (
+        db.Index("ix_archived_treatments_appointment", "appointment_id"),
+    )
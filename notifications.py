@@ -0,0 +1,73 @@
+import json
+import logging
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from models import db, User, Slot, Appointment
+from jobs import jobs
+
+# Patient notifications, sent from the job queue. Routes call
+# appointment_event() in the same transaction as the change; the 'notify'
+# job then writes the message to the 'hms.notify' logger (the place to plug
+# in e-mail/SMS delivery). Reminders for tomorrow's visits are fanned out once
+# a day from REMINDER_HOUR by a scheduled job that reads them in one query.
+
+logger = logging.getLogger('hms.notify')
+
+MESSAGES = {
+    'booked': "Your appointment with {doctor} on {date} ({time}) is confirmed.",
+    'cancelled': "Your appointment with {doctor} on {date} ({time}) has been cancelled.",
+    'completed': "Your visit with {doctor} on {date} is complete.",
+    'treatment': "{doctor} has added treatment details for your visit on {date}.",
+    'reminder': "Reminder: you have an appointment with {doctor} tomorrow ({date}, {time}).",
+}
+
+_doctor = aliased(User, name='doctor_user')
+
+
+# Queues a notification about `appointment` (call before the route's commit).
+# The key ties it to this booking of the appointment (rebooked rows get a new
+# created_at), so a repeated request does not notify twice.
+def appointment_event(appointment, event):
+    stamp = int(appointment.created_at.timestamp()) if appointment.created_at else 0
+    jobs.enqueue('notify', {'appointment_id': appointment.id, 'event': event},
+                 key=f"{event}:{appointment.id}:{stamp}")
+
+
+@jobs.handler('notify')
+def notify(appointment_id, event):
+    row = db.session.execute(
+        select(User.id, User.email, User.name, _doctor.name, Slot.date, Slot.time)
+        .select_from(Appointment)
+        .join(User, User.id == Appointment.patient_id)
+        .join(_doctor, _doctor.id == Appointment.doctor_id)
+        .join(Slot, Slot.id == Appointment.slot_id)
+        .where(Appointment.id == appointment_id)).first()
+    if row is None:
+        return  # appointment deleted (or archived) since
+    user_id, email, name, doctor, day, time = row
+    logger.info(json.dumps({
+        'to': email, 'user_id': user_id, 'event': event, 'appointment_id': appointment_id,
+        'message': MESSAGES[event].format(name=name, doctor=doctor, date=day.strftime('%d/%m/%Y'),
+                                          time=time),
+    }))
+
+
+# One reminder job per booked slot tomorrow, from a single query on slots by date
+@jobs.handler('reminders')
+def send_reminders(day):
+    day = date.fromisoformat(day)
+    appointment_ids = db.session.scalars(
+        select(Slot.appointment_id)
+        .where(Slot.date == day, Slot.state == 'booked'))
+    jobs.enqueue_many([('notify', {'appointment_id': ap_id, 'event': 'reminder'},
+                        f"reminder:{ap_id}:{day.isoformat()}") for ap_id in appointment_ids])
+
+
+@jobs.scheduled
+def schedule_reminders():
+    now = datetime.now()
+    if now.hour >= current_app.config['REMINDER_HOUR']:
+        tomorrow = (now.date() + timedelta(days=1)).isoformat()
+        jobs.enqueue('reminders', {'day': tomorrow}, key=f"reminders:{tomorrow}")
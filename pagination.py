@@ -0,0 +1,76 @@
+from datetime import date, datetime
+from flask import abort
+from sqlalchemy import or_, and_
+from models import Slot, Appointment, Treatment
+
+# Keyset pagination shared by the dashboards and the JSON API. Each helper
+# returns (rows, next cursor or None); a malformed cursor is a 400.
+
+
+# rows per page (dashboard tables, API lists)
+PAGE_SIZE = 20
+
+# Keyset page over a single increasing id column (?<param>=<last id>)
+def id_page(query, column, cursor):
+    if cursor:
+        try:
+            query = query.filter(column > int(cursor))
+        except ValueError:
+            abort(400)
+    rows = query.order_by(column.asc()).limit(PAGE_SIZE + 1).all()
+    next_cursor = None
+    if len(rows) > PAGE_SIZE:
+        rows = rows[:PAGE_SIZE]
+        next_cursor = str(getattr(rows[-1], column.key))
+    return rows, next_cursor
+
+
+# Keyset page of appointments ordered by slot date (asc), shift (desc), id (asc)
+# cursor format: <date>_<time>_<appointment id>
+def appointment_page(query, cursor):
+    if cursor:
+        try:
+            c_date, c_time, c_id = cursor.split('_')
+            c_date = date.fromisoformat(c_date)
+            c_id = int(c_id)
+        except ValueError:
+            abort(400)
+        query = query.filter(or_(
+            Slot.date > c_date,
+            and_(Slot.date == c_date, Slot.time < c_time),
+            and_(Slot.date == c_date, Slot.time == c_time, Appointment.id > c_id)))
+    rows = (query
+            .order_by(Slot.date.asc(), Slot.time.desc(), Appointment.id.asc())
+            .limit(PAGE_SIZE + 1)
+            .all())
+    next_cursor = None
+    if len(rows) > PAGE_SIZE:
+        rows = rows[:PAGE_SIZE]
+        last = rows[-1]
+        next_cursor = f"{last.slot.date.isoformat()}_{last.slot.time}_{last.id}"
+    return rows, next_cursor
+
+
+# Keyset page of treatments, newest first: created_at (desc), id (desc)
+# cursor format: <created_at iso>_<treatment id>
+def treatment_page(query, cursor):
+    if cursor:
+        try:
+            c_created, c_id = cursor.split('_')
+            c_created = datetime.fromisoformat(c_created)
+            c_id = int(c_id)
+        except ValueError:
+            abort(400)
+        query = query.filter(or_(
+            Treatment.created_at < c_created,
+            and_(Treatment.created_at == c_created, Treatment.id < c_id)))
+    rows = (query
+            .order_by(Treatment.created_at.desc(), Treatment.id.desc())
+            .limit(PAGE_SIZE + 1)
+            .all())
+    next_cursor = None
+    if len(rows) > PAGE_SIZE:
+        rows = rows[:PAGE_SIZE]
+        last = rows[-1]
+        next_cursor = f"{last.created_at.isoformat()}_{last.id}"
+    return rows, next_cursor
@@ -0,0 +1,117 @@
+import os
+import threading
+from itertools import repeat
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+# Password hashing off the request threads. scrypt/pbkdf2 burn tens to hundreds
+# of ms of CPU per call, so hashes are computed in a small process pool and at
+# most PASSWORD_QUEUE_LIMIT calls may be queued or running at once; past that a
+# caller waits up to PASSWORD_QUEUE_TIMEOUT seconds for room and then gets
+# PasswordPoolBusy (the app answers 503 + Retry-After) instead of piling up
+# behind a login burst. Config:
+#   PASSWORD_HASH_METHOD    werkzeug method incl. cost (default 'scrypt:32768:8:1');
+#                           hashes made with another method are upgraded on login
+#   PASSWORD_POOL_WORKERS   hashing processes (default: CPU count, max 4;
+#                           0 hashes inline on the calling thread)
+#   PASSWORD_QUEUE_LIMIT    queued + running calls allowed (default workers * 8)
+#   PASSWORD_QUEUE_TIMEOUT  seconds to wait for room in the queue (default 2)
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+# `method` spelled out the way werkzeug writes it into the hash ('scrypt' ->
+# 'scrypt:32768:8:1', 'pbkdf2' -> 'pbkdf2:sha256:<default iterations>'), so
+# needs_rehash doesn't flag every login when the config uses a short form
+def _full_method(method):
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        return 'scrypt:32768:8:1'
+    if name == 'pbkdf2' and len(args) < 2:
+        return f"pbkdf2:{args[0] if args else 'sha256'}:{DEFAULT_PBKDF2_ITERATIONS}"
+    return method
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.method = DEFAULT_METHOD
+        self.workers = 0
+        self.queue_limit = 1
+        self.queue_timeout = 2.0
+        self.rejected = 0
+        self._pool = None
+        self._pid = None
+        self._slots = threading.BoundedSemaphore(1)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+        app.config.setdefault('PASSWORD_POOL_WORKERS', min(os.cpu_count() or 1, 4))
+        app.config.setdefault('PASSWORD_QUEUE_LIMIT', max(app.config['PASSWORD_POOL_WORKERS'], 1) * 8)
+        app.config.setdefault('PASSWORD_QUEUE_TIMEOUT', 2.0)
+        self.method = _full_method(app.config['PASSWORD_HASH_METHOD'])
+        self.workers = app.config['PASSWORD_POOL_WORKERS']
+        self.queue_limit = app.config['PASSWORD_QUEUE_LIMIT']
+        self.queue_timeout = app.config['PASSWORD_QUEUE_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(self.queue_limit)
+        self.shutdown()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    # hashes for a batch of passwords (bulk imports), spread over every pool
+    # process; not subject to the request queue limit
+    def hash_many(self, passwords):
+        if not self.workers:
+            return [generate_password_hash(p, self.method) for p in passwords]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._get_pool().map(generate_password_hash, passwords, repeat(self.method), chunksize=chunksize))
+
+    # True if `pwhash` was made with a different method/cost than configured
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.method
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.rejected += 1
+            raise PasswordPoolBusy()
+        try:
+            if not self.workers:
+                return fn(*args)
+            return self._get_pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    # the pool belongs to the process that made it; forked workers start their own
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                # spawn: forking a threaded server process is not safe
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+                self._pid = os.getpid()
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        return {
+            'method': self.method,
+            'workers': self.workers,
+            'queue_limit': self.queue_limit,
+            'rejected': self.rejected,
+        }
+
+
+hasher = PasswordHasher()
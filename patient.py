@@ -0,0 +1,212 @@
+from datetime import date, timedelta
+from flask import Blueprint, render_template, request, url_for, redirect, flash, abort, current_app
+from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
+from models import db, User, Doctor, Slot, Appointment
+from booking import book_slot, availability_slots, slot_status, earliest_open_slots, EARLIEST_MAX_DAYS, LOST, DUPLICATE
+from database import read_only
+from search import search_user_ids
+from pagination import PAGE_SIZE
+from lookups import department_list, department_info, doctor_info, directory_changed
+from notifications import appointment_event
+from timeline import visit_page, patient_summary
+from auth import forget_session_user
+
+# Patient pages: dashboard, doctor search, booking and cancelling, history
+# and profile.
+
+patient = Blueprint('patient', __name__)
+
+###################################################################
+#                            !Patient Routes          
+###################################################################
+
+# PATIENT DASHBOARD
+@patient.route('/patient_dashboard')
+@login_required
+@read_only
+def patient_dashboard():
+    departments = department_list()
+    appointments = (
+        Appointment.query
+        .join(Slot) 
+        .filter(Appointment.patient_id == current_user.id,
+                Slot.date >= date.today())
+        .order_by(Slot.date.asc(), Slot.time.desc()) 
+        .all())
+    
+    return render_template('patient/patient_dash.html', departments=departments, appointments=appointments)
+
+
+# PATIENT SEARCH
+@patient.route('/patient_search')
+@login_required
+def patient_search():
+    q = request.args.get('q')
+    ids = search_user_ids(q, ('name', 'dept'), role='doctor')
+    doctors = (Doctor.query
+               .filter(Doctor.user_id.in_(ids))
+               .options(joinedload(Doctor.user), joinedload(Doctor.department))
+               .all())
+    doctors.sort(key=lambda d: ids.index(d.user_id))  # best match first
+
+    return render_template('patient/search_results.html', doctors=doctors, q=q)
+
+# DEPARTMENT DETAILS
+@patient.route('/department_details/<int:dept_id>')
+@login_required
+def department_details(dept_id):
+    dept = department_info(dept_id)
+    if not dept:
+        abort(404)
+    return render_template('patient/dept_details.html', dept=dept)
+
+
+# EARLIEST OPEN SLOTS (one department, or all of them)
+@patient.route('/earliest_slots')
+@login_required
+@read_only
+def earliest_slots():
+    if current_user.role != 'patient':
+        abort(403)
+    dept_id = request.args.get('dept_id', type=int)
+    dept = department_info(dept_id) if dept_id else None
+    if dept_id and not dept:
+        abort(404)
+    days = min(max(request.args.get('days', 7, type=int), 1), EARLIEST_MAX_DAYS)
+    today = date.today()
+    slots = earliest_open_slots(current_user.id, today, today + timedelta(days=days - 1), dept_id, PAGE_SIZE)
+    return render_template('patient/earliest_slots.html', slots=slots, dept=dept, days=days,
+                           max_days=EARLIEST_MAX_DAYS)
+
+
+# CANCEL APPOINTMENT  (patient/doctor)
+@patient.route('/cancel_appointment/<int:id>', methods=['POST'])
+@login_required
+def cancel_appointment(id):
+    ap = Appointment.query.get_or_404(id)
+    if (ap.patient_id != current_user.id) and (current_user.role not in ['admin', 'doctor']):
+        abort(403)
+    ap.status = 'cancelled'
+    ap.slot.sync_state(ap)
+    appointment_event(ap, 'cancelled')
+    db.session.commit()
+    flash('Appointment cancelled', 'success')
+    return redirect(request.referrer)
+
+# DOCTOR DETAILS
+@patient.route('/doctor_details/<int:doct_id>')
+@login_required
+def doctor_details(doct_id):
+    doctor = doctor_info(doct_id)
+    if not doctor:
+        abort(404)
+    return render_template('patient/doctor_details.html', doctor=doctor)
+
+
+# DOCTOR AVAILABILITY & SLOT BOOKING
+@patient.route('/check_availability/<int:doctor_id>', methods=['GET', 'POST'])
+@login_required
+def check_availability(doctor_id):
+    if current_user.role != 'patient':
+        abort(403)
+        
+    doctor = doctor_info(doctor_id)
+    if not doctor:
+        abort(404)
+
+    if request.method == 'POST':
+        slot_id = request.form.get('slot_id')
+        slot = Slot.query.get(slot_id)
+        if not slot:
+            flash("Slot not found!", "danger")
+            return redirect(url_for('patient.check_availability', doctor_id=doctor_id))
+        
+        outcome, appointment = book_slot(current_user.id, slot)
+
+        if outcome == DUPLICATE:
+            flash(f"You already have a booking on {slot.date} in the {slot.time}!", "warning")
+            return redirect(url_for('patient.check_availability', doctor_id=doctor_id))
+
+        if outcome == LOST:
+            flash("Someone just booked this slot!", "danger")
+            return redirect(url_for('patient.check_availability', doctor_id=doctor_id))
+        
+        flash("Appointment booked successfully!", "success")
+        return redirect(url_for('patient.patient_dashboard'))
+
+    today = date.today()
+    dates = [today + timedelta(days=i) for i in range(7)]
+
+    # existing slots (with their current appointment, one query)
+    slots = availability_slots([doctor_id], today, dates[-1])
+
+    # slot map
+    slot_map = {(s.date, s.time): {'status': slot_status(s, current_user.id), 'id': s.id}
+                for s in slots}
+            
+    return render_template('patient/doctor_availability.html', 
+                           doctor=doctor, 
+                           dates=dates, 
+                           slot_map=slot_map)
+
+
+# PATIENT HISTORY
+@patient.route('/history/<int:id>')
+@login_required
+@read_only
+def history(id):
+    if current_user.role != 'admin' and current_user.id != id:
+        abort(403)
+
+    patient = User.query.get_or_404(id)
+
+    # summary + one page of live and archived visits, newest first
+    visits, visits_next = visit_page(patient.id, request.args.get('v_after'))
+    
+    return render_template('patient/history.html', visits=visits, visits_next=visits_next,
+                           summary=patient_summary(patient.id), patient=patient)
+
+
+# PATIENT : EDIT PROFILE
+@patient.route('/edit_profile/<int:id>', methods=['GET', 'POST'])
+@login_required
+def edit_profile(id):
+    if current_user.role != 'admin' and current_user.id != id:
+        abort(403)
+
+    patient = User.query.get_or_404(id)
+
+    if request.method == 'POST':
+        name = request.form.get('name')
+        email = request.form.get('email')
+        phone = request.form.get('phone')
+        new_password = request.form.get('new_password') 
+
+        # Checking if email id already exists
+        existing_user = User.query.filter_by(email=email).first()
+        if existing_user and existing_user.id != patient.id:
+            flash("Email already in use by another account!", "warning")
+            return redirect(url_for('patient.edit_profile', id=patient.id))
+
+        # Updating 
+        patient.name = name
+        patient.email = email
+        patient.phone = phone
+
+        if new_password and new_password.strip():
+            patient.set_password(new_password)
+
+        if patient.doctor_profile:
+            directory_changed.send(current_app._get_current_object())
+        db.session.commit()
+        forget_session_user(patient.id)
+        flash("Profile updated successfully!", "success")
+        if current_user.role == 'admin':
+            return redirect(url_for('admin.admin_dashboard'))
+        elif current_user.role == 'patient':
+            return redirect(url_for('patient.patient_dashboard'))
+
+    return render_template('patient/edit_profile.html', patient=patient)
+
+
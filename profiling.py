@@ -0,0 +1,151 @@
+import json
+import logging
+import threading
+import time
+from collections import deque, Counter
+from flask import g, request, has_request_context, before_render_template, template_rendered
+from sqlalchemy import event
+
+# Per-request SQL/template profiling. For every request it records the number of
+# statements, total SQL time, template render time, the slowest statements and
+# likely N+1 patterns (the same statement run many times with different
+# parameters). Each request is logged as one JSON line on the 'hms.profile'
+# logger (WARNING when slow or N+1, INFO otherwise) and kept in a ring buffer
+# for the admin /query_profile endpoint. Config:
+#   PROFILE_QUERIES     enable (default True)
+#   PROFILE_SLOW_MS     request time above which it is flagged slow (default 500)
+#   PROFILE_N_PLUS_ONE  repeats of one statement that count as N+1 (default 5)
+#   PROFILE_HISTORY     requests kept for /query_profile (default 200)
+
+logger = logging.getLogger('hms.profile')
+
+TOP_STATEMENTS = 5
+
+
+def _shorten(statement, limit=300):
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + '...'
+
+
+class QueryProfiler:
+    def __init__(self):
+        self.recent = deque(maxlen=200)
+        self.by_endpoint = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        app.config.setdefault('PROFILE_QUERIES', True)
+        app.config.setdefault('PROFILE_SLOW_MS', 500)
+        app.config.setdefault('PROFILE_N_PLUS_ONE', 5)
+        app.config.setdefault('PROFILE_HISTORY', 200)
+        if not app.config['PROFILE_QUERIES']:
+            return
+        self.slow_ms = app.config['PROFILE_SLOW_MS']
+        self.n_plus_one = app.config['PROFILE_N_PLUS_ONE']
+        self.recent = deque(maxlen=app.config['PROFILE_HISTORY'])
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._before_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_execute)
+                event.listen(engine, 'handle_error', self._execute_failed)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    # request lifecycle
+    def _start(self):
+        g.profile = {'start': time.perf_counter(), 'statements': [], 'render': 0.0, 'render_start': []}
+
+    def _finish(self, response):
+        prof = g.pop('profile', None)
+        if prof is None:
+            return response
+        total_ms = (time.perf_counter() - prof['start']) * 1000
+        statements = prof['statements']
+        repeats = Counter(stmt for stmt, _, _ in statements)
+        n_plus_one = [{'statement': _shorten(stmt), 'count': count}
+                      for stmt, count in repeats.most_common()
+                      if count >= self.n_plus_one and
+                      len({params for s, params, _ in statements if s == stmt}) > 1]
+        slowest = sorted(statements, key=lambda s: s[2], reverse=True)[:TOP_STATEMENTS]
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'queries': len(statements),
+            'sql_ms': round(sum(s[2] for s in statements), 2),
+            'render_ms': round(prof['render'], 2),
+            'slowest': [{'statement': _shorten(stmt), 'ms': round(ms, 2)} for stmt, _, ms in slowest],
+            'n_plus_one': n_plus_one,
+            'slow': total_ms >= self.slow_ms,
+        }
+        self._store(record)
+        level = logging.WARNING if (record['slow'] or n_plus_one) else logging.INFO
+        logger.log(level, json.dumps(record))
+        return response
+
+    def _store(self, record):
+        with self._lock:
+            self.recent.append(record)
+            agg = self.by_endpoint.setdefault(record['endpoint'], {
+                'requests': 0, 'queries': 0, 'sql_ms': 0.0, 'total_ms': 0.0,
+                'max_ms': 0.0, 'max_queries': 0, 'n_plus_one': 0})
+            agg['requests'] += 1
+            agg['queries'] += record['queries']
+            agg['sql_ms'] += record['sql_ms']
+            agg['total_ms'] += record['total_ms']
+            agg['max_ms'] = max(agg['max_ms'], record['total_ms'])
+            agg['max_queries'] = max(agg['max_queries'], record['queries'])
+            agg['n_plus_one'] += bool(record['n_plus_one'])
+
+    # SQLAlchemy hooks
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profile_start', []).append(time.perf_counter())
+        if context is not None:
+            context.profile_started = True
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info['profile_start'].pop()
+        if has_request_context() and 'profile' in g:
+            ms = (time.perf_counter() - start) * 1000
+            g.profile['statements'].append((statement, repr(parameters), ms))
+
+    # a failed statement never reaches after_cursor_execute; drop its start time
+    # so the next statement on this (pooled) connection isn't timed from it
+    def _execute_failed(self, context):
+        if getattr(context.execution_context, 'profile_started', False):
+            context.connection.info['profile_start'].pop()
+
+    # template hooks
+    def _before_render(self, sender, template, context, **extra):
+        if has_request_context() and 'profile' in g:
+            g.profile['render_start'].append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        if has_request_context() and 'profile' in g and g.profile['render_start']:
+            start = g.profile['render_start'].pop()
+            g.profile['render'] += (time.perf_counter() - start) * 1000
+
+    # report for /query_profile
+    def report(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, agg in self.by_endpoint.items():
+                n = agg['requests']
+                endpoints[endpoint] = {
+                    'requests': n,
+                    'avg_queries': round(agg['queries'] / n, 1),
+                    'avg_sql_ms': round(agg['sql_ms'] / n, 2),
+                    'avg_ms': round(agg['total_ms'] / n, 2),
+                    'max_ms': agg['max_ms'],
+                    'max_queries': agg['max_queries'],
+                    'n_plus_one_requests': agg['n_plus_one'],
+                }
+            return {'endpoints': endpoints, 'recent': list(self.recent)[::-1]}
+
+
+profiler = QueryProfiler()
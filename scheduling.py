@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func
+from models import db, Slot, Appointment, Treatment
+from database import insert_ignoring_duplicates
+from counters import apply_deltas, status_key, bump_versions, bump_versions_from
+
+SHIFTS = ('morning', 'evening')
+
+
+# One slot row per doctor for every date in [start, end] whose weekday
+# (Mon=0 .. Sun=6) is in `weekdays`, for each shift in `shifts`
+def slot_rows(doctor_ids, start, end, weekdays, shifts):
+    now = datetime.now()
+    rows = []
+    day = start
+    while day <= end:
+        if day.weekday() in weekdays:
+            for doctor_id in doctor_ids:
+                for shift in shifts:
+                    rows.append({'doctor_id': doctor_id, 'date': day, 'time': shift,
+                                 'state': 'open', 'created_at': now})
+        day += timedelta(days=1)
+    return rows
+
+
+# Creates the recurring schedule in one transaction, skipping slots which
+# already exist (unique_slot, see database.insert_ignoring_duplicates).
+# Returns (created, skipped).
+def create_slots(doctor_ids, start, end, weekdays, shifts):
+    rows = slot_rows(doctor_ids, start, end, weekdays, shifts)
+    created = insert_ignoring_duplicates(db.session, Slot, rows, ['doctor_id', 'date', 'time'])
+    if created:
+        bump_versions(db.session.connection(), doctor_ids)
+    db.session.commit()
+    return created, len(rows) - created
+
+
+# Deletes those of the given slots that are still open, with the (cancelled)
+# appointments and treatments left on them: one statement per table, nothing
+# loaded, totals and versions updated here. Returns the number of slots deleted.
+def delete_open_slots(slot_ids):
+    slots = select(Slot.id).where(Slot.id.in_(slot_ids), Slot.state == 'open')
+    theirs = Appointment.slot_id.in_(slots)
+    no_sync = {'synchronize_session': False}
+    conn = db.session.connection()
+
+    # write first, count second (see bulk.delete_users)
+    bump_versions(conn)
+    deltas = {status_key(status): -n for status, n in
+              db.session.query(Appointment.status, func.count())
+              .filter(theirs)
+              .group_by(Appointment.status)}
+    bump_versions_from(conn, 'doctor', select(Slot.doctor_id).where(Slot.id.in_(slots)))
+    bump_versions_from(conn, 'patient', select(Appointment.patient_id).where(theirs))
+
+    deltas['treatments'] = -db.session.execute(
+        delete(Treatment).where(Treatment.appointment_id.in_(select(Appointment.id).where(theirs))),
+        execution_options=no_sync).rowcount
+    db.session.execute(delete(Appointment).where(theirs), execution_options=no_sync)
+    deleted = db.session.execute(delete(Slot).where(Slot.id.in_(slots)), execution_options=no_sync).rowcount
+    apply_deltas(conn, deltas)
+    db.session.commit()
+    return deleted
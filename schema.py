@@ -0,0 +1,128 @@
+import re
+from sqlalchemy import event, inspect
+from models import db, User, Appointment
+from search import create_search_index
+
+# Tables large enough that a full scan in a route query is a bug
+HOT_TABLES = ('users', 'slots', 'appointments', 'treatments')
+_scan = re.compile(r"^SCAN (\w+)")
+# SQLite names an aliased table by its alias (SCAN users_1, SCAN doctor_user)
+_alias = re.compile(r"\b(\w+) AS (\w+)\b")
+
+
+# True if a plan line reads a whole HOT_TABLES table, directly or by an alias
+# given in `statement`
+def _full_scan(line, statement):
+    scan = _scan.match(line)
+    if not scan or 'INDEX' in line:
+        return False
+    aliases = {alias: table for table, alias in _alias.findall(statement)}
+    return aliases.get(scan.group(1), scan.group(1)) in HOT_TABLES
+
+
+# Brings an existing database up to the current models: new tables via
+# create_all(), plus any column or index declared in models.py that an older
+# data.db is missing (create_all() never touches tables that already exist).
+# Returns a list of applied changes.
+def upgrade_schema():
+    db.create_all()
+    changes = []
+    with db.engine.begin() as conn:
+        added = _add_missing_columns(conn)
+        changes += [f"column {name}" for name in added]
+        if 'slots.appointment_id' in added:
+            rebuild_slot_state(conn)
+            changes.append("backfill slots.state")
+        changes += [f"index {name}" for name in _add_missing_indexes(conn)]
+        if create_search_index(conn):
+            changes.append("search index user_search")
+    return changes
+
+
+def _add_missing_columns(conn):
+    insp = inspect(conn)
+    added = []
+    for table in db.metadata.sorted_tables:
+        existing = {col['name'] for col in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(conn.dialect)}"
+            if col.server_default is not None:
+                ddl += f" DEFAULT '{col.server_default.arg}'"
+            if not col.nullable:
+                ddl += " NOT NULL"
+            conn.exec_driver_sql(ddl)
+            added.append(f"{table.name}.{col.name}")
+    return added
+
+
+def _add_missing_indexes(conn):
+    existing = {index['name'] for table in db.metadata.sorted_tables
+                for index in inspect(conn).get_indexes(table.name)}
+    created = []
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=conn)
+                created.append(index.name)
+    return created
+
+
+# Recomputes every slot's occupancy from its latest appointment
+def rebuild_slot_state(conn):
+    conn.exec_driver_sql(
+        "UPDATE slots SET appointment_id = "
+        "(SELECT max(a.id) FROM appointments a WHERE a.slot_id = slots.id)")
+    conn.exec_driver_sql(
+        "UPDATE slots SET state = coalesce("
+        "(SELECT CASE a.status WHEN 'booked' THEN 'booked' WHEN 'completed' THEN 'completed' END "
+        " FROM appointments a WHERE a.id = slots.appointment_id), 'open')")
+
+
+# Runs the dashboard/history/availability routes through the test client as a
+# real patient, doctor and admin, and returns EXPLAIN QUERY PLAN output for
+# every SELECT they issue: [(url, statement, plan lines, uses_index)]
+def explain_routes(app):
+    ap = Appointment.query.first()
+    admin = User.query.filter_by(role='admin').first()
+    if not (ap and admin):
+        return None
+
+    routes = [
+        (ap.patient_id, '/patient_dashboard'),
+        (ap.patient_id, f'/history/{ap.patient_id}'),
+        (ap.patient_id, f'/check_availability/{ap.doctor_id}'),
+        (ap.doctor_id, '/doctor_dashboard'),
+        (ap.doctor_id, f'/patient_history/{ap.patient_id}'),
+        (admin.id, '/admin_dashboard'),
+    ]
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    report = []
+    for user_id, url in routes:
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user_id)
+            sess['_fresh'] = True
+        captured.clear()
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            # fresh app context per request: own session and login cache
+            with app.app_context():
+                client.get(url)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        with db.engine.connect() as conn:
+            for statement, parameters in captured:
+                plan = [row[3] for row in conn.exec_driver_sql(
+                    "EXPLAIN QUERY PLAN " + statement, parameters)]
+                uses_index = not any(_full_scan(line, statement) for line in plan)
+                report.append((url, statement, plan, uses_index))
+    return report
@@ -0,0 +1,136 @@
+import re
+from sqlalchemy import event, select, text, column, or_, false
+from models import db, User, Doctor, Department
+
+# Full-text search over users. On SQLite an FTS5 table holds one row per user
+# (rowid = users.id) with name, email, phone, role and, for doctors, their
+# department name. An after_flush hook keeps it in step with the ORM in the
+# same transaction, so searches never scan the users table. Other databases
+# fall back to ILIKE.
+
+SEARCH_LIMIT = 50
+
+# column weights for bm25 ranking: name, email, phone, dept, role
+_WEIGHTS = "10.0, 2.0, 2.0, 5.0, 0.0"
+
+_CREATE = ("CREATE VIRTUAL TABLE user_search USING fts5("
+           "name, email, phone, dept, role, "
+           "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')")
+
+_FILL = ("INSERT INTO user_search (rowid, name, email, phone, dept, role) "
+         "SELECT u.id, u.name, u.email, coalesce(u.phone, ''), coalesce(d.name, ''), u.role "
+         "FROM users u "
+         "LEFT JOIN doctors doc ON doc.user_id = u.id "
+         "LEFT JOIN departments d ON d.id = doc.dept_id")
+
+# engine -> whether it has the user_search table
+_has_index = {}
+
+
+def _indexed(conn):
+    if conn.dialect.name != 'sqlite':
+        return False
+    if conn.engine not in _has_index:
+        _has_index[conn.engine] = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'user_search'").first() is not None
+    return _has_index[conn.engine]
+
+
+# Creates and fills the FTS table if missing; returns True if it was created
+def create_search_index(conn):
+    _has_index.pop(conn.engine, None)
+    if conn.dialect.name != 'sqlite' or _indexed(conn):
+        return False
+    conn.exec_driver_sql(_CREATE)
+    conn.exec_driver_sql(_FILL)
+    _has_index[conn.engine] = True
+    return True
+
+
+def rebuild_search_index(conn):
+    conn.exec_driver_sql("DELETE FROM user_search")
+    conn.exec_driver_sql(_FILL)
+
+
+def _refresh(conn, user_ids):
+    ids = ", ".join(str(int(i)) for i in user_ids)
+    conn.exec_driver_sql(f"DELETE FROM user_search WHERE rowid IN ({ids})")
+    conn.exec_driver_sql(f"{_FILL} WHERE u.id IN ({ids})")
+
+
+# For bulk statements that bypass the ORM: re-reads these users into the
+# index (users that no longer exist are dropped)
+def reindex_users(conn, user_ids):
+    if user_ids and _indexed(conn):
+        _refresh(conn, user_ids)
+
+
+@event.listens_for(db.session, 'after_flush')
+def sync_search_index(session, flush_context):
+    conn = session.connection()
+    if not _indexed(conn):
+        return
+    stale = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            stale.add(obj.id)
+        elif isinstance(obj, Doctor):
+            stale.add(obj.user_id)
+        elif isinstance(obj, Department) and obj not in session.new:
+            stale.update(conn.execute(select(Doctor.user_id).where(Doctor.dept_id == obj.id)).scalars())
+    stale.discard(None)
+    if stale:
+        _refresh(conn, stale)
+
+
+# FTS5 query: every word must prefix-match one of `columns` (AND semantics)
+def _match_expr(term, columns, role):
+    words = re.findall(r'\w+', (term or '').lower())
+    if not words:
+        return None
+    cols = '{' + ' '.join(columns) + '}'
+    expr = ' AND '.join(f'{cols} : "{w}"*' for w in words)
+    if role:
+        expr += f' AND role : "{role}"'
+    return expr
+
+
+def _ilike(term, columns):
+    fields = {'name': User.name, 'email': User.email, 'phone': User.phone, 'dept': Department.name}
+    like = f"%{term}%"
+    return or_(*[fields[c].ilike(like) for c in columns])
+
+
+# Filter clause on User.id for queries that page/sort the matches themselves.
+# Without FTS the clause is an ILIKE, so 'dept' needs Department joined.
+def match_filter(term, columns, role=None):
+    if not _indexed(db.session.connection()):
+        return _ilike(term, columns)
+    expr = _match_expr(term, columns, role)
+    if expr is None:
+        return false()
+    matches = (text("SELECT rowid FROM user_search WHERE user_search MATCH :q")
+               .bindparams(q=expr)
+               .columns(column('rowid')))
+    return User.id.in_(matches)
+
+
+# Best-ranked matching user ids (at most `limit`)
+def search_user_ids(term, columns, role=None, limit=SEARCH_LIMIT):
+    if not _indexed(db.session.connection()):
+        query = (db.session.query(User.id)
+                 .outerjoin(Doctor, Doctor.user_id == User.id)
+                 .outerjoin(Department, Department.id == Doctor.dept_id)
+                 .filter(_ilike(term, columns)))
+        if role:
+            query = query.filter(User.role == role)
+        return [i for (i,) in query.order_by(User.name).limit(limit)]
+
+    expr = _match_expr(term, columns, role)
+    if expr is None:
+        return []
+    rows = db.session.execute(
+        text(f"SELECT rowid FROM user_search WHERE user_search MATCH :q "
+             f"ORDER BY bm25(user_search, {_WEIGHTS}) LIMIT :limit"),
+        {'q': expr, 'limit': limit})
+    return [i for (i,) in rows]
@@ -0,0 +1,99 @@
+import os
+import sys
+from importlib import import_module
+from models import db
+
+# Production server (`flask --app app serve`): the app under gunicorn, in
+# SERVER_WORKERS processes with SERVER_THREADS request threads each. Right
+# after the fork each worker drops the database connections it inherited, so
+# its pool is opened fresh and used by that process only (the password pool
+# already restarts per pid). `kill -HUP <master pid>` replaces the workers
+# gracefully: new ones start, old ones finish their requests for up to
+# SERVER_GRACEFUL_TIMEOUT seconds; TERM stops the same way.
+# With SERVER_PRELOAD (default) the app is created once in the master and
+# forked, so workers start without import/startup cost, but HUP workers run
+# the master's code: deploy new code with `kill -USR2` (a new master from the
+# files on disk; then QUIT the old one) or a restart. With SERVER_PRELOAD off
+# every worker imports the project afresh and calls create_app(), so HUP is
+# enough. Either way HMS_* variables and the server options are read when
+# the master starts; changing them needs a restart.
+# Config (app.config or HMS_* environment, e.g. HMS_SERVER_WORKERS=4):
+#   SERVER_BIND              address to listen on (default '127.0.0.1:8000')
+#   SERVER_WORKERS           worker processes (default 2 * CPUs + 1)
+#   SERVER_THREADS           request threads per worker (default 4; keep it
+#                            within DB_POOL_SIZE + DB_MAX_OVERFLOW)
+#   SERVER_TIMEOUT           seconds before a silent worker is killed and replaced (default 30)
+#   SERVER_GRACEFUL_TIMEOUT  seconds a stopping worker gets to finish (default 30)
+#   SERVER_MAX_REQUESTS      recycle a worker after this many requests, 0 = never (default 0)
+#   SERVER_ACCESS_LOG        access log file, '-' = stderr (default: none)
+#   SERVER_PRELOAD           build the app in the master and fork it (default True)
+# Background jobs and counter reconciliation are not run in the web workers:
+# run `flask --app app work-jobs` next to the server.
+
+
+def init_app(app):
+    app.config.setdefault('SERVER_BIND', '127.0.0.1:8000')
+    app.config.setdefault('SERVER_WORKERS', 2 * (os.cpu_count() or 1) + 1)
+    app.config.setdefault('SERVER_THREADS', 4)
+    app.config.setdefault('SERVER_TIMEOUT', 30)
+    app.config.setdefault('SERVER_GRACEFUL_TIMEOUT', 30)
+    app.config.setdefault('SERVER_MAX_REQUESTS', 0)
+    app.config.setdefault('SERVER_ACCESS_LOG', None)
+    app.config.setdefault('SERVER_PRELOAD', True)
+
+
+# gunicorn settings for `app` (after init_app)
+def server_options(app):
+    max_requests = app.config['SERVER_MAX_REQUESTS']
+
+    # in the new worker: forget the master's connections (close=False leaves
+    # them to the master instead of closing its sockets from here)
+    def post_fork(server, worker):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+    return {
+        'bind': app.config['SERVER_BIND'],
+        'workers': app.config['SERVER_WORKERS'],
+        'threads': app.config['SERVER_THREADS'],
+        'worker_class': 'gthread',
+        'timeout': app.config['SERVER_TIMEOUT'],
+        'graceful_timeout': app.config['SERVER_GRACEFUL_TIMEOUT'],
+        'max_requests': max_requests,
+        'max_requests_jitter': max_requests // 10,  # don't recycle every worker at once
+        'accesslog': app.config['SERVER_ACCESS_LOG'],
+        'preload_app': app.config['SERVER_PRELOAD'],
+        'post_fork': post_fork,
+    }
+
+
+# Drops this project's modules from sys.modules, so the next import reads
+# the files on disk (the master imported them before forking)
+def _forget_project_modules():
+    root = os.path.dirname(os.path.abspath(__file__)) + os.sep
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, '__file__', None) or ''
+        if path.startswith(root) and 'site-packages' not in path:
+            del sys.modules[name]
+
+
+def serve(app):
+    from gunicorn.app.base import BaseApplication  # production dependency, Unix only
+
+    init_app(app)
+    options = server_options(app)
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for name, value in options.items():
+                self.cfg.set(name, value)
+
+        # preloaded: once, in the master; otherwise in every new worker
+        def load(self):
+            if options['preload_app']:
+                return app
+            _forget_project_modules()
+            return import_module('app').create_app()
+
+    Server().run()
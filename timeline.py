@@ -0,0 +1,212 @@
+import json
+import re
+from datetime import date, datetime
+from flask import abort
+from sqlalchemy import select, union_all, insert, delete, or_, and_
+from sqlalchemy.orm import aliased
+from models import (db, User, Doctor, Department, Slot, Appointment, Treatment, PatientSummary,
+                    ArchivedSlot, ArchivedAppointment, ArchivedTreatment)
+from counters import bump_versions
+from pagination import PAGE_SIZE
+
+# Patient medical-history timeline (history, patient_history, /api/v1).
+# Visits are read one keyset page at a time from the live and archived tables
+# together (newest first), so a chronic patient's page costs the same as a
+# new patient's. Next to them sits a per-patient summary in
+# patient_summaries: visits, last visit, visits per department, how often
+# each diagnosis came up and the most recent medicines. add_treatment_details
+# folds each new treatment into it in the same transaction (record_treatment);
+# `flask --app app rebuild-summaries` recomputes all of them from the visits.
+
+RECENT_MEDICINES = 10  # medicines kept, most recent first
+MAX_DIAGNOSES = 100    # distinct diagnoses kept per patient (rarest dropped first)
+RECURRING = 2          # a diagnosis seen this often is shown as recurring
+
+_doctor = aliased(User, name='doctor_user')
+_medicine_sep = re.compile(r'[,;\n]+')
+
+# (appointment, slot, treatment) models for live and archived visits
+_SOURCES = ((Appointment, Slot, Treatment), (ArchivedAppointment, ArchivedSlot, ArchivedTreatment))
+
+
+def _visits(source, patient_id, doctor_id=None, treated_only=False):
+    ap, slot, tr = source
+    query = (select(ap.id, slot.date, slot.time, ap.doctor_id, _doctor.name.label('doctor'),
+                    Department.name.label('department'), tr.visit_type, tr.tests_done, tr.diagnosis,
+                    tr.prescription, tr.medicines)
+             .select_from(ap)
+             .join(slot, slot.id == ap.slot_id)
+             .join(_doctor, _doctor.id == ap.doctor_id)
+             .join(Doctor, Doctor.user_id == ap.doctor_id)
+             .outerjoin(Department, Department.id == Doctor.dept_id)
+             .where(ap.patient_id == patient_id))
+    if treated_only:
+        query = query.join(tr, tr.appointment_id == ap.id)
+    else:
+        query = query.outerjoin(tr, tr.appointment_id == ap.id).where(ap.status == 'completed')
+    if doctor_id is not None:
+        query = query.where(ap.doctor_id == doctor_id)
+    return query
+
+
+# Keyset page of a patient's completed visits (live + archived), newest first:
+# date (desc), shift (evening before morning), id (desc). Optionally only the
+# visits with one doctor. cursor format: <date>_<time>_<appointment id>.
+# Returns (rows, next cursor or None); rows have the columns of _visits().
+def visit_page(patient_id, cursor=None, doctor_id=None):
+    arms = [_visits(source, patient_id, doctor_id) for source in _SOURCES]
+    visits = union_all(*arms).subquery('visits')
+    query = select(visits)
+    if cursor:
+        try:
+            c_date, c_time, c_id = cursor.split('_')
+            c_date = date.fromisoformat(c_date)
+            c_id = int(c_id)
+        except ValueError:
+            abort(400)
+        query = query.where(or_(
+            visits.c.date < c_date,
+            and_(visits.c.date == c_date, visits.c.time > c_time),
+            and_(visits.c.date == c_date, visits.c.time == c_time, visits.c.id < c_id)))
+    rows = db.session.execute(query
+                              .order_by(visits.c.date.desc(), visits.c.time.asc(), visits.c.id.desc())
+                              .limit(PAGE_SIZE + 1)).all()
+    next_cursor = None
+    if len(rows) > PAGE_SIZE:
+        rows = rows[:PAGE_SIZE]
+        last = rows[-1]
+        next_cursor = f"{last.date.isoformat()}_{last.time}_{last.id}"
+    return rows, next_cursor
+
+
+## Summaries
+
+def _diagnosis_key(diagnosis):
+    return ' '.join(diagnosis.split()).capitalize()
+
+
+def _medicine_names(medicines):
+    return [' '.join(m.split()) for m in _medicine_sep.split(medicines or '') if m.strip()]
+
+
+# Folds one visit (oldest to newest) into summary data
+def _fold(data, day, department, diagnosis, medicines):
+    data['visits'] += 1
+    if day and (data['last_visit'] is None or day > data['last_visit']):
+        data['last_visit'] = day
+    if department:
+        data['departments'][department] = data['departments'].get(department, 0) + 1
+    if diagnosis and diagnosis.strip():
+        key = _diagnosis_key(diagnosis)
+        counts = data['diagnoses']
+        counts[key] = counts.get(key, 0) + 1
+        if len(counts) > MAX_DIAGNOSES:
+            del counts[min((k for k in counts if k != key), key=counts.get)]
+    recent = data['medicines']
+    for name in reversed(_medicine_names(medicines)):
+        recent[:] = [m for m in recent if m.lower() != name.lower()]
+        recent.insert(0, name)
+    del recent[RECENT_MEDICINES:]
+
+
+def _empty():
+    return {'visits': 0, 'last_visit': None, 'departments': {}, 'diagnoses': {}, 'medicines': []}
+
+
+def _load(row):
+    return {'visits': row.visits, 'last_visit': row.last_visit, 'departments': json.loads(row.departments),
+            'diagnoses': json.loads(row.diagnoses), 'medicines': json.loads(row.medicines)}
+
+
+def _columns(data):
+    return {'visits': data['visits'], 'last_visit': data['last_visit'],
+            'departments': json.dumps(data['departments']), 'diagnoses': json.dumps(data['diagnoses']),
+            'medicines': json.dumps(data['medicines'])}
+
+
+# Summary data from every treated visit of a patient (live + archived)
+def _compute(patient_id):
+    visits = union_all(*[_visits(source, patient_id, treated_only=True) for source in _SOURCES]).subquery()
+    data = _empty()
+    for v in db.session.execute(select(visits.c.date, visits.c.department, visits.c.diagnosis,
+                                       visits.c.medicines)
+                                .order_by(visits.c.date, visits.c.time.desc(), visits.c.id)):
+        _fold(data, v.date, v.department, v.diagnosis, v.medicines)
+    return data
+
+
+# Adds a just-created treatment to its patient's summary, in the caller's
+# transaction (call before the commit). The summary row is read under a write
+# lock (the flush already holds SQLite's; FOR UPDATE elsewhere), so two
+# treatments for one patient can't overwrite each other's update.
+def record_treatment(appointment, treatment):
+    db.session.flush()
+    patient_id = appointment.patient_id
+    summary = db.session.get(PatientSummary, patient_id, with_for_update=True, populate_existing=True)
+    if summary is None:
+        # first summary of this patient: built from the whole history, this treatment included
+        db.session.add(PatientSummary(patient_id=patient_id, **_columns(_compute(patient_id))))
+    else:
+        data = _load(summary)
+        department = appointment.doctor.department.name if appointment.doctor.department else None
+        _fold(data, appointment.slot.date, department, treatment.diagnosis, treatment.medicines)
+        for name, value in _columns(data).items():
+            setattr(summary, name, value)
+    bump_versions(db.session.connection(), [appointment.doctor_id], [patient_id])
+    # the treatment delta feed (treatments.treatment_changes) keys on this
+    appointment.updated_at = datetime.now()
+
+
+# The summary shown on the timeline: {'visits', 'last_visit', 'departments'
+# [(name, visits)], 'recurring' [(diagnosis, times)], 'medicines' [...]}.
+# Patients without a stored summary yet get one computed on the fly.
+def patient_summary(patient_id):
+    row = db.session.get(PatientSummary, patient_id)
+    data = _load(row) if row else _compute(patient_id)
+    return {
+        'visits': data['visits'],
+        'last_visit': data['last_visit'],
+        'departments': sorted(data['departments'].items(), key=lambda kv: (-kv[1], kv[0])),
+        'recurring': sorted(((d, n) for d, n in data['diagnoses'].items() if n >= RECURRING),
+                            key=lambda kv: (-kv[1], kv[0])),
+        'medicines': data['medicines'],
+    }
+
+
+# Recomputes every patient's summary in one ordered pass over all treated
+# visits; returns the number of summaries written
+def rebuild_summaries(batch_size=1000):
+    arms = []
+    for ap, slot, tr in _SOURCES:
+        arms.append(select(ap.patient_id, ap.id, slot.date, slot.time, Department.name.label('department'),
+                           tr.diagnosis, tr.medicines)
+                    .select_from(ap)
+                    .join(slot, slot.id == ap.slot_id)
+                    .join(tr, tr.appointment_id == ap.id)
+                    .join(Doctor, Doctor.user_id == ap.doctor_id)
+                    .outerjoin(Department, Department.id == Doctor.dept_id))
+    visits = union_all(*arms).subquery()
+    rows = (db.session.execute(select(visits)
+                               .order_by(visits.c.patient_id, visits.c.date, visits.c.time.desc(), visits.c.id)
+                               .execution_options(yield_per=batch_size)))
+
+    db.session.execute(delete(PatientSummary))
+    written, batch = 0, []
+    current, data = None, None
+    for v in rows:
+        if v.patient_id != current:
+            if current is not None:
+                batch.append({'patient_id': current, **_columns(data)})
+            current, data = v.patient_id, _empty()
+            if len(batch) >= batch_size:
+                db.session.execute(insert(PatientSummary), batch)
+                written += len(batch)
+                batch = []
+        _fold(data, v.date, v.department, v.diagnosis, v.medicines)
+    if current is not None:
+        batch.append({'patient_id': current, **_columns(data)})
+    if batch:
+        db.session.execute(insert(PatientSummary), batch)
+        written += len(batch)
+    db.session.commit()
+    return written
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+from flask import abort
+from sqlalchemy.orm import contains_eager
+from models import Appointment, Treatment
+from pagination import treatment_page
+
+# A doctor's completed treatments ("Assigned Patients" on doctor_dashboard and
+# /api/v1/treatments): one keyset page at a time with the appointment and
+# patient loaded in the same query, plus a delta of what changed since a
+# token so a client can refresh without reloading the page. Only live rows;
+# archived visits stay in patient_history.
+
+# a delta token is the time of the previous read minus this overlap, so a
+# change committed while that read ran is sent again rather than missed
+DELTA_OVERLAP = timedelta(seconds=2)
+
+
+def _doctor_treatments(doctor_id):
+    return (Treatment.query
+            .join(Appointment)
+            .options(contains_eager(Treatment.appointment).joinedload(Appointment.patient))
+            .filter(Appointment.doctor_id == doctor_id))
+
+
+# (treatments, next cursor), newest first
+def treatments_page(doctor_id, cursor=None):
+    return treatment_page(_doctor_treatments(doctor_id).filter(Appointment.status == 'completed'), cursor)
+
+
+def delta_token(now=None):
+    return ((now or datetime.now()) - DELTA_OVERLAP).isoformat()
+
+
+# Treatments whose appointment changed after `since` (a token from
+# delta_token()): (completed ones to add or update, ids of ones to drop, next
+# token). A new or edited treatment shows up because record_treatment touches
+# its appointment's updated_at. The token only moves on when something
+# changed, so an idle client keeps polling the same URL and gets 304s.
+def treatment_changes(doctor_id, since):
+    try:
+        since_at = datetime.fromisoformat(since)
+    except ValueError:
+        abort(400)
+    now = datetime.now()
+    rows = (_doctor_treatments(doctor_id)
+            .filter(Appointment.updated_at > since_at)
+            .order_by(Treatment.created_at.desc(), Treatment.id.desc())
+            .all())
+    changed = [t for t in rows if t.appointment.status == 'completed']
+    removed = [t.id for t in rows if t.appointment.status != 'completed']
+    return changed, removed, delta_token(now) if rows else since